@@ -1,13 +1,28 @@
+import argparse
+import itertools
 import subprocess
+import threading
 import pandas as pd
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from tqdm import tqdm
 import logging
+import os
 import sys
 import shutil
 import tempfile
 
+from blob_materializer import BlobReaders, changed_java_files, materialize_subset, subset_dest
+from designite_batch import BatchPacker, StagedSubset
+from git_worktrees import WorktreePool
+from jvm_scheduler import JvmScheduler, default_budget_mb
+from repo_sync import SyncManifest, SyncTarget, sync_repos
+from smell_cache import SmellCache, TypeIndex, attribute_smells
+from smell_ingest import (SmellRuns, ingest_smell_records, open_smell_records, smell_totals, smell_type_deltas,
+                          unmatched_count, write_smell_records)
+from workspace import Workspace
+
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = PROJECT_ROOT / "data" 
 TABLES_DIR = PROJECT_ROOT / "outputs" / "tables"
@@ -20,6 +35,42 @@ HUMAN_COMMITS = DATA_DIR / "baseline_refactoring_commits.parquet"
 REPOS_AGENTIC = PROJECT_ROOT / "repos_forks"
 REPOS_HUMAN = PROJECT_ROOT / "repos_baseline"
 
+WORKTREES_DIR = TEMP_DIR / "worktrees"
+BATCH_DIR = TEMP_DIR / "batches"
+SMELL_CACHE = DATA_DIR / "smell_cache.jsonl"
+SYNC_MANIFEST = DATA_DIR / "repo_sync_manifest.json"
+SMELL_RECORDS_DIR = DATA_DIR / "smell_records"
+JVM_HISTORY = LOGS_DIR / "jvm_history.jsonl"
+FILE_LEVEL_SUFFIX = "_file_level"  # outputs of --smell-cache runs
+
+parser = argparse.ArgumentParser(description="Count Designite smells before and after each refactoring commit.")
+parser.add_argument("--workers", type=int, default=1, help="Number of commits analyzed concurrently.")
+parser.add_argument("--checkout", action="store_true",
+                    help="Check out sha^/sha and copy the changed files (one git worktree per worker when "
+                         "--workers > 1) instead of reading them from the object database.")
+parser.add_argument("--smell-cache", action="store_true",
+                    help=f"Reuse per-file smell counts keyed by git blob ID ({SMELL_CACHE.name}); only files "
+                         "not seen before are sent to Designite. Counts only smells tied to a single file, so "
+                         "the results are not comparable to uncached runs and go to separate "
+                         f"*{FILE_LEVEL_SUFFIX}.csv files.")
+parser.add_argument("--batch", action="store_true",
+                    help="Pack the before/after subsets of many commits into one Designite run per batch. Subsets "
+                         "sharing or importing each other's packages never share a batch; commits of a "
+                         "failed batch are dropped from the output.")
+parser.add_argument("--batch-files", type=int, default=2000, help="Max .java files per Designite batch.")
+parser.add_argument("--batch-mb", type=int, default=64, help="Max source megabytes per Designite batch.")
+parser.add_argument("--sync-workers", type=int, default=4, help="Repositories cloned/fetched concurrently.")
+parser.add_argument("--force-sync", action="store_true",
+                    help=f"Fetch every repository even if {SYNC_MANIFEST.name} shows all its commits are local.")
+parser.add_argument("--mem-budget-gb", type=float, default=default_budget_mb() / 1024,
+                    help="Total memory the concurrent Designite JVMs may use (default: 75%% of RAM).")
+parser.add_argument("--temp-quota-gb", type=float, default=20,
+                    help=f"Disk space Designite outputs may take in {TEMP_DIR.name} before they are ingested and evicted.")
+parser.add_argument("--ram-dir", type=Path, default=None,
+                    help="RAM-backed directory (e.g. /dev/shm/designite) for materializing small subsets.")
+parser.add_argument("--ram-mb", type=int, default=1024, help="Max megabytes of subsets kept in --ram-dir at once.")
+args = parser.parse_args()
+
 for d in [DATA_DIR, TABLES_DIR, LOGS_DIR, TEMP_DIR]:
     d.mkdir(parents=True, exist_ok=True)
 
@@ -32,6 +83,8 @@ logging.basicConfig(
 )
 print(f"Logging to {LOG_FILE}")
 
+scheduler = JvmScheduler(int(args.mem_budget_gb * 1024), JVM_HISTORY)
+
 
 def run_subprocess(cmd, timeout=300):
     try:
@@ -42,18 +95,6 @@ def run_subprocess(cmd, timeout=300):
     except Exception as e:
         return False, "", str(e)
 
-def ensure_repo(repo_path: Path, full_name: str, dataset: str):
-    if not repo_path.exists():
-        url = f"https://github.com/{full_name}.git"
-        logging.warning(f"Repo not found for {full_name}. Cloning...")
-        ok, _, err = run_subprocess(["git", "clone", url, str(repo_path)], timeout=600)
-        if not ok:
-            logging.error(f"Failed to clone {url}: {err}")
-            return False
-    else:
-        run_subprocess(["git", "-C", str(repo_path), "fetch", "--all"])
-    return True
-
 def get_changed_files(repo: Path, sha: str) -> list[str]:
     ok, out, err = run_subprocess(
         ["git", "-C", str(repo), "diff-tree", "--no-commit-id", "--name-only", "-r", sha]
@@ -69,18 +110,15 @@ def checkout_commit(repo: Path, sha: str) -> bool:
         logging.error(f"❌ Git checkout failed for {repo}@{sha}: {err}")
     return ok
 
-def copy_subset(repo: Path, changed_files: list[str]) -> Path:
-    temp_dir = Path(tempfile.mkdtemp(prefix="subset_", dir=TEMP_DIR))
+def copy_subset(repo: Path, changed_files: list[str], temp_root: Path = TEMP_DIR) -> Path:
+    temp_dir = Path(tempfile.mkdtemp(prefix="subset_", dir=temp_root))
     copied = 0
     for fpath in changed_files:
         src = repo / fpath
         if not src.exists():
             continue
-        dest = temp_dir / fpath
+        dest = subset_dest(temp_dir, fpath)
         try:
-            if len(str(dest)) > 240:
-                flat_name = "_".join(fpath.replace("\\", "/").split("/")[-5:])
-                dest = temp_dir / flat_name
             dest.parent.mkdir(parents=True, exist_ok=True)
             shutil.copy2(src, dest)
             copied += 1
@@ -88,34 +126,67 @@ def copy_subset(repo: Path, changed_files: list[str]) -> Path:
             logging.warning(f"⚠️ Could not copy {src}: {e}")
     return temp_dir
 
-def run_designite(input_dir: Path, output_dir: Path, label: str) -> int:
+def source_size(input_dir: Path) -> tuple[int, int]:
+    """(number of .java files, total bytes) under `input_dir`."""
+    files = size = 0
+    for root, _, names in os.walk(input_dir):
+        for name in names:
+            if name.endswith(".java"):
+                files += 1
+                size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+def invoke_designite(input_dir: Path, output_dir: Path, label: str) -> bool:
     output_dir.mkdir(parents=True, exist_ok=True)
-    cmd = [
-        "java", "-Xmx6G", "-jar", str(DESIGNITE_JAR),
-        "-i", str(input_dir),
-        "-o", str(output_dir),
-        "-d", "-f", "csv"
-    ]
-    logging.info(f"Running Designite on {label}")
-    ok, out, err = run_subprocess(cmd, timeout=900)
+    files, size = source_size(input_dir)
+    for attempt in range(2):
+        # Heap and timeout are sized from the input; the JVM waits until it fits in the memory budget.
+        with scheduler.slot("designite", files, size) as slot:
+            cmd = [
+                "java", *slot.java_opts, "-jar", str(DESIGNITE_JAR),
+                "-i", str(input_dir),
+                "-o", str(output_dir),
+                "-d", "-f", "csv"
+            ]
+            logging.info(f"Running Designite on {label} ({files} files, -Xmx{slot.heap_mb}m, {slot.timeout}s)")
+            ok, out, err = run_subprocess(cmd, timeout=slot.timeout)
+            if not ok:
+                slot.failed(err, timed_out=err == "Timeout expired")
+        if ok or not slot.oom or attempt:
+            break
+        if scheduler.estimate("designite", files, size).heap_mb <= slot.heap_mb:
+            break  # already at max_heap_mb; a retry would fail the same way
+        logging.warning(f"Designite ran out of memory on {label}; retrying with a larger heap")
     if not ok:
         logging.error(f"❌ Designite failed for {label}")
         logging.error(err[:300])
-        return 0
-    return count_smells(output_dir)
+    return ok
 
-def count_smells(output_dir: Path) -> int:
-    total = 0
-    for csv in output_dir.glob("*.csv"):
-        if "Metric" in csv.name or "Summary" in csv.name:
-            continue
-        try:
-            df = pd.read_csv(csv)
-            total += len(df)
-        except Exception as e:
-            logging.warning(f"Could not read {csv.name}: {e}")
-    return total
+def run_designite(input_dir: Path, output_dir: Path, label: str, key):
+    """Run Designite and register its output for ingestion; a failed run counts as no smells."""
+    if invoke_designite(input_dir, output_dir, label):
+        workspace.add_output(output_dir)
+        smell_runs.add_run(output_dir, key)
+    else:
+        workspace.evict(output_dir)
 
+def cached_smells(reader, files: dict[str, str], output_dir: Path, label: str) -> int:
+    """Smell total of {path: blob} files, running Designite only on blobs missing from the cache."""
+    missing = smell_cache.split(files)
+    if missing:
+        index = TypeIndex()
+        with workspace.scratch(len(missing)) as root:
+            subset = materialize_subset(reader, missing, root, on_write=index.add)
+            if invoke_designite(subset, output_dir, label):
+                per_file, unattributed = attribute_smells(output_dir, index)
+                if unattributed:
+                    logging.info(f"{label}: {unattributed} smells not tied to a single file (not counted)")
+                # Blobs that could not be read are left uncached, so the next run retries them
+                smell_cache.put_many({blob: dict(per_file.get(path, {})) for path, blob in missing.items()
+                                      if path in index.written})
+            shutil.rmtree(subset, ignore_errors=True)
+        workspace.evict(output_dir)  # everything needed is in the cache now
+    return smell_cache.total(files)
 
 print("Loading commit datasets...")
 agentic = pd.read_parquet(AGENTIC_COMMITS)
@@ -125,69 +196,244 @@ combined = pd.concat([agentic, human], ignore_index=True)
 combined = combined[combined["has_refactoring"] == True]
 print(f"✅ Loaded {len(combined)} refactoring commits across datasets.")
 
-results = []
-start_time = time.time()
 
-for i, row in tqdm(combined.iterrows(), total=len(combined), desc="Analyzing commits"):
+def repo_path(full_name: str, dataset: str) -> Path:
+    return (REPOS_AGENTIC if dataset == "Agentic" else REPOS_HUMAN) / full_name.split("/")[-1]
+
+
+# Sync every repository once up front instead of fetching per commit.
+targets = {}
+for full_name, dataset, sha in zip(combined["full_name"], combined["dataset"], combined["sha"]):
+    repo = repo_path(full_name, dataset)
+    targets.setdefault(repo, SyncTarget(repo, full_name, set())).shas.add(sha)
+synced = sync_repos(targets.values(), SyncManifest(SYNC_MANIFEST), args.sync_workers, args.force_sync)
+print(f"✅ {len(synced)}/{len(targets)} repositories ready.")
+
+
+worktrees = WorktreePool(WORKTREES_DIR) if args.checkout and args.workers > 1 else None
+blob_readers = BlobReaders()
+smell_cache = SmellCache(SMELL_CACHE) if args.smell_cache else None
+if smell_cache is not None and args.checkout:
+    sys.exit("--smell-cache needs blob IDs and cannot be combined with --checkout.")
+if args.batch and (args.checkout or smell_cache is not None):
+    sys.exit("--batch cannot be combined with --checkout or --smell-cache.")
+packer = BatchPacker(BATCH_DIR, args.batch_files, args.batch_mb << 20) if args.batch else None
+workspace = Workspace(TEMP_DIR, int(args.temp_quota_gb * (1 << 30)), args.ram_dir, args.ram_mb << 20)
+smell_runs = SmellRuns()
+records = open_smell_records() if smell_cache is None else None
+records_lock = threading.Lock()
+batch_seconds = {}
+failed_sides = set()  # (row_id, side) whose Designite batch failed; those commits are dropped
+batch_guard = threading.Lock()
+worker_ids = itertools.count()
+worker_state = threading.local()
+
+
+def checkout_dir(repo: Path) -> Path:
+    """Where this worker checks commits out: the shared clone when serial, its own worktree otherwise."""
+    if worktrees is None:
+        return repo
+    if not hasattr(worker_state, "worker_id"):
+        worker_state.worker_id = next(worker_ids)
+    return worktrees.get(repo, worker_state.worker_id)
+
+
+def run_batch(batch):
+    """Run Designite once over a packed batch and record its output and each subset's share of the time."""
+    label = f"{batch.path.name} ({len(batch.subsets)} subsets, {batch.files} files)"
+    output_dir = TEMP_DIR / f"{batch.path.name}_out"
+    t0 = time.time()
+    ok = invoke_designite(batch.path, output_dir, label)
+    if ok:
+        workspace.add_output(output_dir)
+        smell_runs.add_batch(output_dir, batch)
+    else:
+        workspace.evict(output_dir)
+    elapsed = time.time() - t0
+    shutil.rmtree(batch.path, ignore_errors=True)
+    with batch_guard:
+        for s in batch.subsets:
+            batch_seconds[s.key] = elapsed * s.files / max(batch.files, 1)
+            if not ok:
+                failed_sides.add(s.key)
+
+
+def stage_for_batch(reader, key, files: dict[str, str]):
+    """Materialize one side of a commit and hand it to the packer, running any batch it fills."""
+    if not files:
+        return
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    subset = StagedSubset(key, None)
+    subset.path = materialize_subset(reader, files, BATCH_DIR, on_write=subset.record)
+    for batch in packer.add(subset):
+        run_batch(batch)
+
+
+def ingest_outputs():
+    """Ingest every Designite output registered so far, then delete those output dirs."""
+    with records_lock:
+        runs = smell_runs.drain()
+        ingest_smell_records(records, runs)
+    for output_dir in runs.output_dirs():
+        workspace.evict(Path(output_dir))
+
+
+def analyze_commit(i, row):
     repo_name = row["full_name"].split("/")[-1]
     full_name, sha = row["full_name"], row["sha"]
     dataset, agent = row["dataset"], row["agent"]
-    repo = (REPOS_AGENTIC if dataset == "Agentic" else REPOS_HUMAN) / repo_name
-
-    if not ensure_repo(repo, full_name, dataset):
-        continue
+    repo = repo_path(full_name, dataset)
+    if repo not in synced:
+        return None
 
-    changed = get_changed_files(repo, sha)
+    if args.checkout:
+        changes = None
+        changed = get_changed_files(repo, sha)
+    else:
+        changes = changed_java_files(repo, sha) or []
+        changed = [c.path for c in changes]
     num_changed = len(changed)
     logging.info(f"{dataset}/{agent}/{repo_name}@{sha[:8]}: {num_changed} files changed")
 
     if num_changed == 0:
         logging.info(f"Skipping {repo_name}@{sha[:8]} — 0 files changed")
-        continue
+        return None
 
     label = f"{dataset}/{agent}/{repo_name}@{sha[:8]}"
+    out_prefix = f"{repo_name}_{sha[:8]}" if args.workers == 1 else f"{repo_name}_{sha[:8]}_{i}"
     t0 = time.time()
 
-    #Before refactor files
-    if checkout_commit(repo, f"{sha}^"):
-        subset_before = copy_subset(repo, changed)
-        smells_before = run_designite(subset_before, TEMP_DIR / f"{repo_name}_{sha[:8]}_before", f"{label}_before")
-        shutil.rmtree(subset_before, ignore_errors=True)
-    else:
-        smells_before = 0
+    result = {"dataset": dataset, "agent": agent, "repo": repo_name, "commit": sha, "row_id": i, "label": label}
+
+    if packer is not None:
+        reader = blob_readers.get(repo)
+        stage_for_batch(reader, (i, "before"), {c.path: c.old_blob for c in changes if c.old_blob})
+        stage_for_batch(reader, (i, "after"), {c.path: c.new_blob for c in changes if c.new_blob})
+    elif changes is not None and smell_cache is not None:
+        reader = blob_readers.get(repo)
+        result["smells_before"] = cached_smells(reader, {c.path: c.old_blob for c in changes if c.old_blob},
+                                                TEMP_DIR / f"{out_prefix}_before", f"{label}_before")
+        result["smells_after"] = cached_smells(reader, {c.path: c.new_blob for c in changes if c.new_blob},
+                                               TEMP_DIR / f"{out_prefix}_after", f"{label}_after")
+    elif changes is not None:
+        reader = blob_readers.get(repo)
+        with workspace.scratch(num_changed) as root:
+            subset_before = materialize_subset(reader, {c.path: c.old_blob for c in changes if c.old_blob}, root)
+            run_designite(subset_before, TEMP_DIR / f"{out_prefix}_before", f"{label}_before", (i, "before"))
+            shutil.rmtree(subset_before, ignore_errors=True)
 
-    #After refactor files
-    if checkout_commit(repo, sha):
-        subset_after = copy_subset(repo, changed)
-        smells_after = run_designite(subset_after, TEMP_DIR / f"{repo_name}_{sha[:8]}_after", f"{label}_after")
-        shutil.rmtree(subset_after, ignore_errors=True)
+            subset_after = materialize_subset(reader, {c.path: c.new_blob for c in changes if c.new_blob}, root)
+            run_designite(subset_after, TEMP_DIR / f"{out_prefix}_after", f"{label}_after", (i, "after"))
+            shutil.rmtree(subset_after, ignore_errors=True)
     else:
-        smells_after = 0
+        try:
+            tree = checkout_dir(repo)
+        except subprocess.CalledProcessError as e:
+            logging.error(f"❌ Could not create worktree for {repo}: {e.stderr.decode(errors='ignore')[:300]}")
+            return None
 
-    delta = smells_after - smells_before
-    elapsed = time.time() - t0
+        #Before refactor files
+        with workspace.scratch(num_changed) as root:
+            if checkout_commit(tree, f"{sha}^"):
+                subset_before = copy_subset(tree, changed, root)
+                run_designite(subset_before, TEMP_DIR / f"{out_prefix}_before", f"{label}_before", (i, "before"))
+                shutil.rmtree(subset_before, ignore_errors=True)
+
+            #After refactor files
+            if checkout_commit(tree, sha):
+                subset_after = copy_subset(tree, changed, root)
+                run_designite(subset_after, TEMP_DIR / f"{out_prefix}_after", f"{label}_after", (i, "after"))
+                shutil.rmtree(subset_after, ignore_errors=True)
+
+    # Smell counts (except cached ones) come from the bulk ingestion after all commits ran.
+    result["elapsed"] = time.time() - t0
+    return result
+
+
+start_time = time.time()
+rows = list(combined.iterrows())
+ordered = [None] * len(rows)
 
+with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+    futures = {pool.submit(analyze_commit, i, row): pos for pos, (i, row) in enumerate(rows)}
+    progress = tqdm(as_completed(futures), total=len(futures), desc="Analyzing commits")
+    for n, fut in enumerate(progress, 1):
+        ordered[futures[fut]] = fut.result()
+        if records is not None and workspace.over_quota():
+            ingest_outputs()
+            logging.info(f"Workspace over quota: ingested and evicted outputs ({workspace.usage()})")
+        progress.set_postfix_str(workspace.usage(), refresh=False)
+        if n % 100 == 0:
+            workspace.report()
+
+if packer is not None:
+    remaining = packer.flush()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        list(tqdm(pool.map(run_batch, remaining), total=len(remaining), desc="Running remaining batches"))
+    shutil.rmtree(BATCH_DIR, ignore_errors=True)
+
+if worktrees is not None:
+    worktrees.cleanup()
+blob_readers.close()
+if smell_cache is not None:
+    total = smell_cache.hits + smell_cache.misses
+    print(f"Smell cache: {smell_cache.hits}/{total} file lookups served from {SMELL_CACHE.name}")
+
+analyzed = [r for r in ordered if r is not None]
+failed_rows = {row_id for row_id, _ in failed_sides}
+if failed_rows:
+    logging.warning(f"Dropping {len(failed_rows)} commits whose Designite batch failed (a failed batch has no counts)")
+    analyzed = [r for r in analyzed if r["row_id"] not in failed_rows]
+commits = pd.DataFrame(analyzed, columns=["row_id", "dataset", "agent", "repo", "commit"])
+totals = {}
+type_deltas = None
+if records is not None:
+    print("Ingesting Designite outputs...")
+    ingest_outputs()
+    unmatched = unmatched_count(records)
+    if unmatched:
+        logging.info(f"{unmatched} batched smells matched no commit subset (not counted)")
+    write_smell_records(records, commits, SMELL_RECORDS_DIR)
+    totals = smell_totals(records).set_index("row_id").to_dict("index")
+    type_deltas = commits.merge(smell_type_deltas(records), on="row_id").drop(columns="row_id")
+    records.close()
+workspace.report()
+
+results = []
+for r in analyzed:
+    counts = totals.get(r["row_id"], {})
+    before = int(r.get("smells_before", counts.get("smells_before", 0)))
+    after = int(r.get("smells_after", counts.get("smells_after", 0)))
+    elapsed = r["elapsed"] + batch_seconds.get((r["row_id"], "before"), 0) + batch_seconds.get((r["row_id"], "after"), 0)
+    print(f"{r['label']}: Δ={after - before}, before={before}, after={after}, {elapsed:.1f}s")
     results.append({
-        "dataset": dataset, "agent": agent, "repo": repo_name,
-        "commit": sha, "smells_before": smells_before,
-        "smells_after": smells_after, "delta": delta,
+        "dataset": r["dataset"], "agent": r["agent"], "repo": r["repo"],
+        "commit": r["commit"], "smells_before": before,
+        "smells_after": after, "delta": after - before,
         "runtime_sec": round(elapsed, 2)
     })
 
-    print(f"{label}: Δ={delta}, before={smells_before}, after={smells_after}, {elapsed:.1f}s")
-
 #Output
 df = pd.DataFrame(results)
-out_csv = DATA_DIR / "smell_deltas_per_commit.csv"
+# Cached counts leave out smells spanning several files and depend on which files shared a Designite
+# run, so they are kept apart from full per-commit counts.
+suffix = FILE_LEVEL_SUFFIX if smell_cache is not None else ""
+out_csv = DATA_DIR / f"smell_deltas_per_commit{suffix}.csv"
 df.to_csv(out_csv, index=False)
 print(f"💾 Saved → {out_csv}")
+if smell_cache is not None:
+    print("⚠️ --smell-cache counts file-level smells only; these numbers are not comparable to an uncached run.")
+if type_deltas is not None:
+    type_csv = DATA_DIR / "smell_type_deltas_per_commit.csv"
+    type_deltas.to_csv(type_csv, index=False)
+    print(f"💾 Saved → {type_csv} (records in {SMELL_RECORDS_DIR})")
 
 if not df.empty:
     summary = (
         df.groupby(["dataset", "agent"])[["smells_before", "smells_after", "delta"]]
         .agg(["mean", "median", "std", "min", "max"]).round(2)
     )
-    summary.to_csv(TABLES_DIR / "smell_summary_stats_by_agent.csv")
+    summary.to_csv(TABLES_DIR / f"smell_summary_stats_by_agent{suffix}.csv")
     print("Summary saved.")
 else:
     print("No valid results.")
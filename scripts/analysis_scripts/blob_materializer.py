@@ -0,0 +1,121 @@
+import logging
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+NULL_OID = "0" * 40
+
+
+class FileChange(NamedTuple):
+    path: str
+    old_blob: Optional[str]  # None when the file did not exist in sha^
+    new_blob: Optional[str]  # None when the file was deleted by sha
+
+
+def changed_java_files(repo: Path, sha: str) -> Optional[List[FileChange]]:
+    """`.java` files touched by `sha` (vs. its first parent) with their before/after blob IDs.
+
+    Same file set as `git diff-tree --name-only -r sha`; None if git fails.
+    """
+    result = subprocess.run(
+        ["git", "-C", str(repo), "diff-tree", "--no-commit-id", "-r", "-z", sha],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        logging.warning(f"git diff-tree failed for {repo}@{sha}: {result.stderr.decode(errors='ignore')}")
+        return None
+    fields = result.stdout.decode("utf-8", errors="surrogateescape").split("\0")
+    changes = []
+    for meta, path in zip(fields[0::2], fields[1::2]):
+        # ":<old mode> <new mode> <old oid> <new oid> <status>"
+        parts = meta.lstrip(":").split()
+        if len(parts) < 5 or not path.strip().endswith(".java"):
+            continue
+        old_oid, new_oid = parts[2], parts[3]
+        changes.append(FileChange(
+            path,
+            None if old_oid == NULL_OID else old_oid,
+            None if new_oid == NULL_OID else new_oid,
+        ))
+    return changes
+
+
+class BlobReader:
+    """A single long-running `git cat-file --batch` process for one repository."""
+
+    def __init__(self, repo: Path):
+        self.repo = repo
+        self._lock = threading.Lock()
+        self._proc = subprocess.Popen(
+            ["git", "-C", str(repo), "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, oid: str) -> Optional[bytes]:
+        with self._lock:
+            self._proc.stdin.write(f"{oid}\n".encode())
+            self._proc.stdin.flush()
+            header = self._proc.stdout.readline().decode().split()
+            if len(header) != 3:  # "<oid> missing" / "<oid> ambiguous"
+                return None
+            size = int(header[2])
+            data = self._proc.stdout.read(size)
+            self._proc.stdout.read(1)  # trailing LF
+            return data
+
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.wait()
+
+
+class BlobReaders:
+    """Lazily started BlobReader per repository, shared by all workers."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._readers: Dict[Path, BlobReader] = {}
+
+    def get(self, repo: Path) -> BlobReader:
+        with self._guard:
+            if repo not in self._readers:
+                self._readers[repo] = BlobReader(repo)
+            return self._readers[repo]
+
+    def close(self):
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+
+
+def subset_dest(temp_dir: Path, fpath: str) -> Path:
+    """Destination of `fpath` inside a subset dir, flattening paths that would get too long."""
+    dest = temp_dir / fpath
+    if len(str(dest)) > 240:
+        flat_name = "_".join(fpath.replace("\\", "/").split("/")[-5:])
+        dest = temp_dir / flat_name
+    return dest
+
+
+def materialize_subset(reader: BlobReader, files: Dict[str, str], temp_root: Path,
+                       on_write: Optional[Callable[[str, bytes], None]] = None) -> Path:
+    """Write {path: blob_id} into a fresh `subset_*` dir under `temp_root` and return it.
+
+    `on_write(path, content)` is called for every file written.
+    """
+    temp_dir = Path(tempfile.mkdtemp(prefix="subset_", dir=temp_root))
+    for fpath, oid in files.items():
+        data = reader.read(oid)
+        if data is None:
+            logging.warning(f"⚠️ Blob {oid} for {fpath} missing in {reader.repo}")
+            continue
+        dest = subset_dest(temp_dir, fpath)
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            dest.write_bytes(data)
+            if on_write is not None:
+                on_write(fpath, data)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not write {dest}: {e}")
+    return temp_dir
@@ -0,0 +1,251 @@
+"""DuckDB catalog over the pipeline outputs.
+
+Every `data/*.parquet` (and `data/processed/*.parquet` not shadowed by one) is
+registered as a view named after its file, plus `smell_deltas` /
+`smell_type_deltas` for the CSVs of the smell analysis. On top of those:
+
+- `refactoring_commits`: agentic and (normalized) human commits with their
+  refactoring counts, tagged with `dataset`
+- `refactoring_events`: one row per detected refactoring with the commit's
+  agent and project
+
+The aggregate helpers run in DuckDB and only return the (small) result to
+pandas. Ad-hoc queries:
+
+    python scripts/analysis_scripts/catalog.py --list
+    python scripts/analysis_scripts/catalog.py "SELECT agent, count(*) FROM refactoring_commits GROUP BY 1"
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = PROJECT_ROOT / "data"
+
+CSV_VIEWS = {
+    "smell_deltas": "smell_deltas_per_commit.csv",
+    "smell_type_deltas": "smell_type_deltas_per_commit.csv",
+}
+
+
+def _columns(con: duckdb.DuckDBPyConnection, view: str) -> set:
+    return {row[0] for row in con.execute(f'DESCRIBE "{view}"').fetchall()}
+
+
+def _refactoring_rows(con: duckdb.DuckDBPyConnection, refactorings: str, commits: str,
+                      label: Optional[str] = None) -> str:
+    """(sha, full_name, agent, refactoring_type) of one refactorings table, whichever shape it has.
+
+    The shipped files have `commit_sha` (and an `agent_type` the analysis does
+    not use); build_*_dataset.py writes `sha`, and for agentic commits also
+    `full_name`/`agent`. Rows without their own agent and project are
+    attributed through the commit table (a left join on every distinct commit
+    match), as the analysis always has; `label` replaces the agent if given.
+    """
+    cols = _columns(con, refactorings)
+    sha = "commit_sha" if "commit_sha" in cols else "sha"
+    if label is None and {"agent", "full_name"} <= cols:
+        return (f"SELECT lower(trim({sha})) AS sha, full_name, agent, refactoring_type "
+                f'FROM "{refactorings}" WHERE refactoring_type IS NOT NULL')
+    return f"""
+        SELECT r.sha, c.full_name, {"c.agent" if label is None else f"'{label}'"} AS agent, r.refactoring_type
+        FROM (SELECT lower(trim({sha})) AS sha, refactoring_type FROM "{refactorings}") r
+        LEFT JOIN (SELECT DISTINCT lower(trim(sha)) AS sha, agent, full_name FROM "{commits}") c USING (sha)
+        WHERE r.refactoring_type IS NOT NULL"""
+
+
+def _refactoring_events_sql(con: duckdb.DuckDBPyConnection) -> str:
+    agentic = _refactoring_rows(con, "agentic_refactorings", "agentic_refactoring_commits")
+    human = _refactoring_rows(con, "baseline_refactorings", "baseline_refactoring_commits", "Human")
+    return f"""
+        SELECT sha, full_name, agent, refactoring_type, 'Agentic' AS dataset FROM ({agentic})
+        UNION ALL
+        SELECT sha, full_name, agent, refactoring_type, 'Human' FROM ({human})
+    """
+
+
+DERIVED_VIEWS = {
+    "refactoring_commits": """
+        SELECT lower(trim(sha)) AS sha, pr_id, number, full_name, agent, 'Agentic' AS dataset,
+               coalesce(refactoring_count, 0) AS refactoring_count, has_refactoring
+        FROM agentic_refactoring_commits
+        UNION ALL
+        SELECT lower(trim(sha)), pr_id, number, full_name, agent, 'Human',
+               coalesce(refactoring_count, 0), has_refactoring
+        FROM baseline_refactoring_commits_normalized
+    """,
+    # SQL depends on the schema of the refactorings tables, so it is built once they are registered.
+    "refactoring_events": _refactoring_events_sql,
+}
+
+# Which sources each derived view needs; views whose inputs are missing are skipped.
+DERIVED_INPUTS = {
+    "refactoring_commits": ("agentic_refactoring_commits", "baseline_refactoring_commits_normalized"),
+    "refactoring_events": ("agentic_refactoring_commits", "baseline_refactoring_commits",
+                           "agentic_refactorings", "baseline_refactorings"),
+}
+
+
+def _quote(path: Path) -> str:
+    return "'" + path.as_posix().replace("'", "''") + "'"
+
+
+def connect(data_dir: Path = DATA_DIR, con: Optional[duckdb.DuckDBPyConnection] = None) -> duckdb.DuckDBPyConnection:
+    """In-memory DuckDB connection with a view per pipeline output; nothing is read until queried."""
+    con = con or duckdb.connect()
+    views = {}
+    for folder in (data_dir, data_dir / "processed"):
+        for path in sorted(folder.glob("*.parquet")):
+            views.setdefault(path.stem, f"SELECT * FROM read_parquet({_quote(path)})")
+    for name, filename in CSV_VIEWS.items():
+        path = data_dir / filename
+        if path.exists():
+            views[name] = f"SELECT * FROM read_csv({_quote(path)}, header = true)"
+    for name, sql in views.items():
+        con.execute(f'CREATE OR REPLACE VIEW "{name}" AS {sql}')
+    for name, sql in DERIVED_VIEWS.items():
+        if all(src in views for src in DERIVED_INPUTS[name]):
+            sql = sql(con) if callable(sql) else sql
+            con.execute(f'CREATE OR REPLACE VIEW "{name}" AS {sql}')
+    return con
+
+
+def views(con: duckdb.DuckDBPyConnection) -> list:
+    return [row[0] for row in con.execute(
+        "SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name").fetchall()]
+
+
+#Refactoring aggregates
+def per_project_refactoring(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """Commit and refactoring counts per (agent, project), agentic projects first."""
+    return con.execute("""
+        SELECT agent, full_name,
+               count(DISTINCT sha) AS total_commits,
+               sum(has_refactoring::INT)::BIGINT AS refactoring_commits,
+               sum(refactoring_count)::BIGINT AS total_refactorings,
+               avg(refactoring_count) AS mean_refactorings,
+               median(refactoring_count)::DOUBLE AS median_refactorings,
+               sum(has_refactoring::INT) / count(DISTINCT sha) * 100 AS "refactoring_rate_%",
+               sum(refactoring_count) / count(DISTINCT sha) AS refactors_per_all_commits,
+               CASE WHEN sum(has_refactoring::INT) > 0 THEN sum(refactoring_count) / sum(has_refactoring::INT)
+                    ELSE 0 END AS refactors_per_refactoring_commit,
+               'Observed ' || lower(dataset) || ' commits' AS denominator
+        FROM refactoring_commits
+        GROUP BY dataset, agent, full_name
+        ORDER BY dataset, agent NULLS LAST, full_name NULLS LAST
+    """).df()
+
+
+def per_agent_commit_rates(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """Commits, refactoring commits and refactorings per agent over both datasets."""
+    return con.execute("""
+        SELECT agent,
+               count(DISTINCT sha) AS total_commits,
+               sum(has_refactoring::INT)::BIGINT AS refactoring_commits,
+               sum(refactoring_count)::BIGINT AS total_refactorings,
+               sum(has_refactoring::INT) / count(DISTINCT sha) * 100 AS "refactoring_rate_%",
+               CASE WHEN sum(has_refactoring::INT) > 0 THEN sum(refactoring_count) / sum(has_refactoring::INT)
+                    ELSE 0 END AS mean_refactors_per_ref_commit
+        FROM refactoring_commits
+        GROUP BY agent
+        ORDER BY agent NULLS LAST
+    """).df()
+
+
+def per_agent_refactors_per_ref_commit(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """Distribution of the refactoring count over each agent's refactoring commits."""
+    return con.execute("""
+        SELECT agent,
+               avg(refactoring_count) AS mean_refactors_per_ref_commit,
+               median(refactoring_count)::DOUBLE AS median_refactors_per_ref_commit,
+               stddev_samp(refactoring_count) AS std_refactors_per_ref_commit,
+               min(refactoring_count) AS min_refactors_per_ref_commit,
+               max(refactoring_count) AS max_refactors_per_ref_commit,
+               count(refactoring_count) AS num_refactoring_commits
+        FROM refactoring_commits
+        WHERE has_refactoring
+        GROUP BY agent
+        ORDER BY agent NULLS LAST
+    """).df()
+
+
+def refactoring_types_by_agent(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """Count and share of each refactoring type within an agent's refactorings."""
+    return con.execute("""
+        SELECT agent, refactoring_type, count(*) AS count,
+               sum(count(*)) OVER (PARTITION BY agent)::BIGINT AS agent_total,
+               count(*) / sum(count(*)) OVER (PARTITION BY agent) * 100 AS share_pct
+        FROM refactoring_events
+        WHERE agent IS NOT NULL
+        GROUP BY agent, refactoring_type
+        ORDER BY agent, share_pct DESC, refactoring_type
+    """).df()
+
+
+def refactoring_intensity(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """Refactorings per commit (commits with at least one) summarized per agent."""
+    return con.execute("""
+        WITH per_commit AS (
+            SELECT agent, sha, count(*) AS n FROM refactoring_events
+            WHERE agent IS NOT NULL GROUP BY agent, sha
+        )
+        SELECT agent, avg(n) AS mean_ref, stddev_samp(n) AS std_ref, median(n)::DOUBLE AS median_ref,
+               min(n) AS min_ref, max(n) AS max_ref
+        FROM per_commit GROUP BY agent ORDER BY agent
+    """).df()
+
+
+#Smell aggregates
+def smell_means_by_agent(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    return con.execute("""
+        SELECT agent, avg(TRY_CAST(smells_before AS DOUBLE)) AS smells_before,
+               avg(TRY_CAST(smells_after AS DOUBLE)) AS smells_after
+        FROM smell_deltas GROUP BY agent ORDER BY agent
+    """).df()
+
+
+def smell_change_by_agent(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """Share of commits per agent whose smell count decreased, stayed the same or increased."""
+    counts = con.execute("""
+        SELECT agent,
+               CASE WHEN d < 0 THEN 'Decreased Smells' WHEN d = 0 THEN 'No Change' ELSE 'Increased Smells' END
+                   AS category,
+               count(*) AS n
+        FROM (SELECT agent, TRY_CAST(delta AS DOUBLE) AS d FROM smell_deltas)
+        GROUP BY ALL
+    """).df()
+    counts = counts.pivot(index="agent", columns="category", values="n").fillna(0).astype(int)
+    return counts.div(counts.sum(axis=1), axis=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the pipeline outputs with DuckDB SQL.")
+    parser.add_argument("sql", nargs="?", help="Query to run against the registered views.")
+    parser.add_argument("--list", action="store_true", help="List the registered views and their columns.")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--out", type=Path, help="Write the result to a .csv or .parquet file instead of printing.")
+    parser.add_argument("--limit", type=int, default=50, help="Rows to print (ignored with --out).")
+    args = parser.parse_args(argv)
+
+    con = connect(args.data_dir)
+    if args.list or not args.sql:
+        for name in views(con):
+            cols = con.execute(f'DESCRIBE "{name}"').fetchall()
+            print(f"{name}: " + ", ".join(f"{c[0]} {c[1]}" for c in cols))
+        return
+
+    rel = con.sql(args.sql)
+    if args.out is not None:
+        fmt = "PARQUET" if args.out.suffix == ".parquet" else "CSV, HEADER"
+        con.execute(f"COPY ({args.sql}) TO {_quote(args.out)} (FORMAT {fmt})")
+        print(f"Saved → {args.out}")
+    else:
+        print(rel.limit(args.limit).df().to_string(index=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
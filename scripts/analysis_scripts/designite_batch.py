@@ -0,0 +1,101 @@
+import itertools
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Hashable, List, Set
+
+from smell_cache import declared_types, imported_packages
+
+
+class StagedSubset:
+    """One side (before/after) of one commit, materialized and waiting for a batch."""
+
+    def __init__(self, key: Hashable, path: Path):
+        self.key = key
+        self.path = path
+        self.files = 0
+        self.bytes = 0
+        self.packages: Set[str] = set()
+        self.imports: Set[str] = set()
+
+    def record(self, fpath: str, content: bytes):
+        """`on_write` hook for materialize_subset."""
+        self.files += 1
+        self.bytes += len(content)
+        self.packages.add(declared_types(content)[0])
+        self.imports.update(imported_packages(content))
+
+
+class Batch:
+    """Several staged subsets laid out as sibling source roots under one Designite input dir.
+
+    Subsets in a batch never share a Java package, so Designite cannot merge
+    their types and every output row maps back to exactly one subset. A subset
+    also never imports from a package another subset of the batch declares, so
+    no dependency between unrelated commits is resolved. References by fully
+    qualified name without an import are not detected and could still link
+    two subsets (and change dependency-based design smells).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.subsets: List[StagedSubset] = []
+        self.packages: Dict[str, StagedSubset] = {}
+        self.imports: Set[str] = set()
+        self.files = 0
+        self.bytes = 0
+
+    def fits(self, subset: StagedSubset, max_files: int, max_bytes: int) -> bool:
+        if self.packages.keys() & (subset.packages | subset.imports) or self.imports & subset.packages:
+            return False
+        if not self.subsets:
+            return True
+        return self.files + subset.files <= max_files and self.bytes + subset.bytes <= max_bytes
+
+    def add(self, subset: StagedSubset):
+        root = self.path / f"s{len(self.subsets)}"
+        self.path.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(subset.path), str(root))
+        subset.path = root
+        self.subsets.append(subset)
+        for pkg in subset.packages:
+            self.packages[pkg] = subset
+        self.imports |= subset.imports
+        self.files += subset.files
+        self.bytes += subset.bytes
+
+
+class BatchPacker:
+    """First-fit packing of staged subsets into batches bounded by file count and source size."""
+
+    def __init__(self, root: Path, max_files: int, max_bytes: int, max_open: int = 8):
+        self.root = root
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        self.open: List[Batch] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _new_batch(self) -> Batch:
+        return Batch(self.root / f"batch_{next(self._ids)}")
+
+    def add(self, subset: StagedSubset) -> List[Batch]:
+        """Place `subset`; return batches that are now full and ready to run."""
+        with self._lock:
+            target = next((b for b in self.open if b.fits(subset, self.max_files, self.max_bytes)), None)
+            if target is None:
+                target = self._new_batch()
+                self.open.append(target)
+            target.add(subset)
+
+            ready = [b for b in self.open if b.files >= self.max_files or b.bytes >= self.max_bytes]
+            if len(self.open) - len(ready) > self.max_open:
+                ready.append(max((b for b in self.open if b not in ready), key=lambda b: b.files))
+            self.open = [b for b in self.open if b not in ready]
+            return ready
+
+    def flush(self) -> List[Batch]:
+        with self._lock:
+            ready, self.open = self.open, []
+            return ready
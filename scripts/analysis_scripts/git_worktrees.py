@@ -0,0 +1,53 @@
+import hashlib
+import logging
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+
+class WorktreePool:
+    """One detached git worktree per (worker, repo), so workers can check out commits independently."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._guard = threading.Lock()
+        self._repo_locks: Dict[Path, threading.Lock] = {}
+        self._trees: Dict[Tuple[Path, int], Path] = {}
+
+    def _repo_lock(self, key: Path) -> threading.Lock:
+        with self._guard:
+            return self._repo_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _tree_name(repo: Path) -> str:
+        """`<name>-<hash of the full path>`: repos_forks/X and repos_baseline/X must not share a worktree."""
+        digest = hashlib.sha1(str(repo.resolve()).encode()).hexdigest()[:8]
+        return f"{repo.name}-{digest}"
+
+    def get(self, repo: Path, worker_id: int) -> Path:
+        """Return (creating on first use) this worker's worktree of `repo`."""
+        key = (repo, worker_id)
+        if key in self._trees:
+            return self._trees[key]
+        path = self.root / f"w{worker_id}" / self._tree_name(repo)
+        with self._repo_lock(path):
+            if not (path / ".git").exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                subprocess.run(["git", "-C", str(repo), "worktree", "prune"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                subprocess.run(["git", "-C", str(repo), "worktree", "add", "--detach", "--force",
+                                str(path)], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        self._trees[key] = path
+        return path
+
+    def cleanup(self):
+        for (repo, _), path in self._trees.items():
+            result = subprocess.run(["git", "-C", str(repo), "worktree", "remove", "--force", str(path)],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                logging.warning(f"Could not remove worktree {path}: {result.stderr.decode(errors='ignore')[:200]}")
+        self._trees.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,139 @@
+"""Kruskal–Wallis, pairwise Mann–Whitney and effect sizes for many metrics at once.
+
+Input is a long-format table with one row per observation (`agent`, `metric`,
+`value`). Each metric is ranked and sorted once: Kruskal–Wallis comes from
+per-group rank sums (`np.bincount`), and every pairwise U from the binary
+searches of effect_sizes.py, so no test re-sorts or re-ranks the data. The
+p-values of the whole family are then Holm and Benjamini–Hochberg adjusted.
+The result is one tidy row per test.
+"""
+from itertools import combinations
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, norm, rankdata
+
+from effect_sizes import interpret_delta
+
+COLUMNS = ["metric", "test", "group_a", "group_b", "n_a", "n_b", "statistic", "p_value",
+           "cliffs_delta", "vargha_delaney_a", "effect_size", "p_holm", "p_bh"]
+
+
+def long_format(df: pd.DataFrame, group_col: str, value_cols: Iterable[str], prefix: str = "") -> pd.DataFrame:
+    """Wide per-observation table → (agent, metric, value) rows, dropping missing values."""
+    value_cols = list(value_cols)
+    out = df[[group_col] + value_cols].melt(id_vars=group_col, var_name="metric", value_name="value")
+    out = out.rename(columns={group_col: "agent"})
+    out["metric"] = prefix + out["metric"]
+    out["value"] = pd.to_numeric(out["value"], errors="coerce")
+    return out.dropna(subset=["agent", "value"])
+
+
+def holm(p: np.ndarray) -> np.ndarray:
+    p = np.asarray(p, dtype=float)
+    order = np.argsort(p, kind="stable")
+    m = len(p)
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(np.maximum.accumulate((m - np.arange(m)) * p[order]), 1.0)
+    return adjusted
+
+
+def benjamini_hochberg(p: np.ndarray) -> np.ndarray:
+    p = np.asarray(p, dtype=float)
+    order = np.argsort(p, kind="stable")
+    m = len(p)
+    scaled = p[order] * m / np.arange(1, m + 1)
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return adjusted
+
+
+def _tie_sum(values: np.ndarray) -> float:
+    """Σ (t³ - t) over the tie groups of `values`."""
+    _, counts = np.unique(values, return_counts=True)
+    counts = counts.astype(float)
+    return float((counts ** 3 - counts).sum())
+
+
+def _kruskal(values: np.ndarray, codes: np.ndarray, k: int):
+    n = len(values)
+    sizes = np.bincount(codes, minlength=k)
+    rank_sums = np.bincount(codes, weights=rankdata(values), minlength=k)
+    h = 12.0 / (n * (n + 1)) * np.sum(rank_sums ** 2 / sizes) - 3 * (n + 1)
+    correction = 1 - _tie_sum(values) / (n ** 3 - n)
+    if correction <= 0:  # all values equal
+        return np.nan, np.nan
+    h /= correction
+    return h, chi2.sf(h, k - 1)
+
+
+def _mann_whitney(x_sorted: np.ndarray, y_sorted: np.ndarray):
+    """U of x, two-sided asymptotic p (tie-corrected, continuity-corrected) and dominance counts."""
+    n1, n2 = len(x_sorted), len(y_sorted)
+    greater = np.searchsorted(y_sorted, x_sorted, side="left").sum()
+    less = (n2 - np.searchsorted(y_sorted, x_sorted, side="right")).sum()
+    ties = n1 * n2 - greater - less
+    u = greater + 0.5 * ties
+    n = n1 + n2
+    mu = n1 * n2 / 2
+    sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - _tie_sum(np.concatenate([x_sorted, y_sorted])) / (n * (n - 1))))
+    if sigma == 0:
+        p = 1.0
+    else:
+        z = (max(u, n1 * n2 - u) - mu - 0.5) / sigma
+        p = min(1.0, 2 * norm.sf(z))
+    return u, p, greater, less, ties
+
+
+def hypothesis_matrix(long_df: pd.DataFrame, reference: Optional[str] = None, min_n: int = 2,
+                      family: str = "all") -> pd.DataFrame:
+    """Test every metric of `long_df` across its agents.
+
+    Per metric: one Kruskal–Wallis row over all agents with at least `min_n`
+    values, then one Mann–Whitney row per agent pair (or per agent against
+    `reference` only) with Cliff's delta and Vargha–Delaney A of `group_a`
+    over `group_b`. `family` is "all" to correct across every test in the
+    table or "metric" to correct within each metric.
+    """
+    rows = []
+    for metric, sub in long_df.groupby("metric", sort=True):
+        sizes = sub.groupby("agent")["value"].size()
+        agents = sorted(sizes.index[sizes >= min_n])
+        sub = sub[sub["agent"].isin(agents)]
+        if len(agents) < 2:
+            continue
+        codes = pd.Categorical(sub["agent"], categories=agents).codes
+        values = sub["value"].to_numpy(dtype=float)
+
+        h, p = _kruskal(values, codes, len(agents))
+        rows.append({"metric": metric, "test": "kruskal_wallis", "group_a": None, "group_b": None,
+                     "n_a": len(values), "n_b": None, "statistic": h, "p_value": p})
+
+        order = np.lexsort((values, codes))
+        bounds = np.cumsum(np.bincount(codes, minlength=len(agents)))
+        sorted_groups = dict(zip(agents, np.split(values[order], bounds[:-1])))
+        if reference is not None:
+            pairs = [(a, reference) for a in agents if a != reference and reference in sorted_groups]
+        else:
+            pairs = list(combinations(agents, 2))
+        for a, b in pairs:
+            x, y = sorted_groups[a], sorted_groups[b]
+            u, p, greater, less, ties = _mann_whitney(x, y)
+            total = len(x) * len(y)
+            delta = (greater - less) / total
+            rows.append({"metric": metric, "test": "mann_whitney", "group_a": a, "group_b": b,
+                         "n_a": len(x), "n_b": len(y), "statistic": u, "p_value": p,
+                         "cliffs_delta": delta, "vargha_delaney_a": (greater + 0.5 * ties) / total,
+                         "effect_size": interpret_delta(delta)})
+
+    out = pd.DataFrame(rows, columns=COLUMNS)
+    valid = out["p_value"].notna()
+    if family == "metric":
+        groups = out[valid].groupby("metric")["p_value"]
+        out.loc[valid, "p_holm"] = groups.transform(lambda s: holm(s.to_numpy()))
+        out.loc[valid, "p_bh"] = groups.transform(lambda s: benjamini_hochberg(s.to_numpy()))
+    else:
+        out.loc[valid, "p_holm"] = holm(out.loc[valid, "p_value"].to_numpy())
+        out.loc[valid, "p_bh"] = benjamini_hochberg(out.loc[valid, "p_value"].to_numpy())
+    return out
@@ -0,0 +1,67 @@
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+import catalog
+from hypothesis_matrix import hypothesis_matrix, long_format
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = PROJECT_ROOT / "data"
+TABLES_DIR = PROJECT_ROOT / "outputs" / "tables"
+TABLES_DIR.mkdir(parents=True, exist_ok=True)
+
+MIN_TYPE_EVENTS = 20  # refactoring types rarer than this overall are not tested
+
+parser = argparse.ArgumentParser(description="Test every smell/refactoring metric across agents in one table.")
+parser.add_argument("--reference", default=None,
+                    help="Only compare each agent against this one (e.g. Human) instead of all pairs.")
+parser.add_argument("--family", choices=["all", "metric"], default="all",
+                    help="Correct p-values across all tests or within each metric.")
+parser.add_argument("--alpha", type=float, default=0.05)
+args = parser.parse_args()
+
+con = catalog.connect(DATA_DIR)
+metrics = []
+
+#Smell counts per commit
+smells = con.execute("SELECT agent, delta, smells_before, smells_after FROM smell_deltas").df()
+metrics.append(long_format(smells, "agent", ["delta", "smells_before", "smells_after"], prefix="smell_"))
+
+#Refactorings per commit
+commits = con.execute("""
+    SELECT agent, refactoring_count, has_refactoring::INT AS has_refactoring FROM refactoring_commits
+""").df()
+metrics.append(long_format(commits, "agent", ["refactoring_count", "has_refactoring"], prefix="commit_"))
+
+#Refactoring rates per project
+projects = catalog.per_project_refactoring(con)
+metrics.append(long_format(projects, "agent", ["refactoring_rate_%", "refactors_per_all_commits"], prefix="project_"))
+
+#Share of each refactoring type among a refactoring commit's refactorings
+type_shares = con.execute("""
+    WITH events AS (SELECT agent, sha, refactoring_type FROM refactoring_events WHERE agent IS NOT NULL),
+         types AS (SELECT refactoring_type FROM events GROUP BY 1 HAVING count(*) >= ?),
+         per_commit AS (SELECT agent, sha, count(*) AS total FROM events GROUP BY ALL),
+         per_type AS (SELECT agent, sha, refactoring_type, count(*) AS n FROM events GROUP BY ALL)
+    SELECT c.agent, 'type_share:' || t.refactoring_type AS metric, coalesce(p.n, 0) / c.total AS value
+    FROM per_commit c CROSS JOIN types t
+    LEFT JOIN per_type p ON p.agent = c.agent AND p.sha = c.sha AND p.refactoring_type = t.refactoring_type
+""", [MIN_TYPE_EVENTS]).df()
+metrics.append(type_shares)
+
+long_df = pd.concat(metrics, ignore_index=True)
+print(f"{long_df['metric'].nunique()} metrics, {len(long_df):,} observations, "
+      f"{long_df['agent'].nunique()} agents")
+
+results = hypothesis_matrix(long_df, reference=args.reference, family=args.family)
+results.to_csv(TABLES_DIR / "hypothesis_matrix.csv", index=False)
+
+pairwise = results[results["test"] == "mann_whitney"]
+print(f"{len(results)} tests; significant at {args.alpha} after Holm: {(results['p_holm'] < args.alpha).sum()}, "
+      f"after BH: {(results['p_bh'] < args.alpha).sum()}")
+print(pairwise[pairwise["p_bh"] < args.alpha]
+      .sort_values("p_bh")
+      .head(20)[["metric", "group_a", "group_b", "cliffs_delta", "effect_size", "p_holm", "p_bh"]]
+      .round(4).to_string(index=False))
+print(f"✅ Saved to {TABLES_DIR / 'hypothesis_matrix.csv'}")
@@ -0,0 +1,247 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+JVM_OVERHEAD_MB = 256  # metaspace, thread stacks, code cache on top of -Xmx
+MIN_HISTORY = 20  # observations needed before history overrides the defaults
+
+
+def default_budget_mb(fraction: float = 0.75) -> int:
+    """`fraction` of physical memory, or 8 GB if it cannot be determined."""
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 8192
+    return int(total / (1 << 20) * fraction)
+
+
+class JobEstimate(NamedTuple):
+    heap_mb: int
+    timeout_sec: int
+
+
+class ResourceModel:
+    """Heap and wall-time estimate for one kind of JVM job from its changed-file count and source size.
+
+    heap    = base_heap_mb + heap_per_source_mb * source MB  (scaled up after OOMs)
+    runtime = base_sec + sec_per_file * files                (refit from history)
+    timeout = timeout_factor * runtime, clamped to [min_timeout, max_timeout]
+    """
+
+    def __init__(self, base_heap_mb: int, heap_per_source_mb: float, min_heap_mb: int, max_heap_mb: int,
+                 base_sec: float, sec_per_file: float, min_timeout: int, max_timeout: int,
+                 timeout_factor: float = 3.0):
+        self.base_heap_mb = base_heap_mb
+        self.heap_per_source_mb = heap_per_source_mb
+        self.min_heap_mb = min_heap_mb
+        self.max_heap_mb = max_heap_mb
+        self.base_sec = base_sec
+        self.sec_per_file = sec_per_file
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self.heap_scale = 1.0
+
+    def estimate(self, files: int, size_bytes: int = 0) -> JobEstimate:
+        heap = (self.base_heap_mb + self.heap_per_source_mb * size_bytes / (1 << 20)) * self.heap_scale
+        heap = int(min(self.max_heap_mb, max(self.min_heap_mb, heap)))
+        runtime = self.base_sec + self.sec_per_file * files
+        timeout = int(min(self.max_timeout, max(self.min_timeout, self.timeout_factor * runtime)))
+        return JobEstimate(heap, timeout)
+
+    def fit(self, records: List[dict]):
+        """Refit the runtime line and the heap scale from finished jobs of this kind."""
+        ooms = sum(1 for r in records if r.get("oom"))
+        self.heap_scale = 1.25 ** min(ooms, 8)
+        done = [r for r in records if r.get("ok")]
+        if len(done) < MIN_HISTORY:
+            return
+        files = np.array([r["files"] for r in done], dtype=float)
+        runtime = np.array([r["runtime_sec"] for r in done], dtype=float)
+        A = np.column_stack([np.ones_like(files), files])
+        (base, per_file), *_ = np.linalg.lstsq(A, runtime, rcond=None)
+        self.base_sec, self.sec_per_file = max(base, 0.0), max(per_file, 0.0)
+        # Keep the timeout above the slowest jobs seen so far relative to the fitted line.
+        predicted = np.maximum(self.base_sec + self.sec_per_file * files, 1.0)
+        self.timeout_factor = max(self.timeout_factor, float(np.quantile(runtime / predicted, 0.99)) * 1.5)
+
+
+DEFAULT_MODELS = {
+    # Designite parses every file of the subset at once; -Xmx6G and 900 s were the old fixed values.
+    "designite": dict(base_heap_mb=1024, heap_per_source_mb=64, min_heap_mb=1024, max_heap_mb=6144,
+                      base_sec=20, sec_per_file=0.5, min_timeout=900, max_timeout=3600),
+    # RefactoringMiner works on one commit diff at a time.
+    "refminer": dict(base_heap_mb=1024, heap_per_source_mb=0, min_heap_mb=1024, max_heap_mb=4096,
+                     base_sec=10, sec_per_file=1.0, min_timeout=300, max_timeout=3600),
+}
+
+
+class JobHistory:
+    """Finished JVM jobs ({kind, files, bytes, heap_mb, runtime_sec, ok, oom, timed_out}) in a JSON Lines file."""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._lock = threading.Lock()
+        self.records: Dict[str, List[dict]] = defaultdict(list)
+        if path is not None and path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.records[rec.get("kind", "")].append(rec)
+
+    def add(self, rec: dict):
+        with self._lock:
+            self.records[rec["kind"]].append(rec)
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec) + "\n")
+
+
+class MemoryBudget:
+    """Blocking reservations of megabytes out of a fixed total, granted in arrival order when they fit.
+
+    A request larger than the whole budget is clamped so it can still run alone.
+    Smaller requests may overtake a waiting one only `max_bypass` times, so big
+    jobs are not starved.
+    """
+
+    def __init__(self, total_mb: int, max_bypass: int = 4):
+        self.total_mb = total_mb
+        self.free_mb = total_mb
+        self.max_bypass = max_bypass
+        self._cond = threading.Condition()
+        self._waiting = deque()
+
+    @contextmanager
+    def reserve(self, mb: int):
+        mb = self.acquire(mb)
+        try:
+            yield
+        finally:
+            self.release(mb)
+
+    def acquire(self, mb: int) -> int:
+        """Block until `mb` (clamped to the total) is granted; returns the amount to `release` later."""
+        mb = min(mb, self.total_mb)
+        ticket = [mb, 0]
+        with self._cond:
+            self._waiting.append(ticket)
+            while not self._can_run(ticket):
+                self._cond.wait()
+            for ahead in self._waiting:
+                if ahead is ticket:
+                    break
+                ahead[1] += 1  # overtaken
+            self._waiting.remove(ticket)
+            self.free_mb -= mb
+            self._cond.notify_all()
+        return mb
+
+    def release(self, mb: int):
+        with self._cond:
+            self.free_mb += mb
+            self._cond.notify_all()
+
+    def _can_run(self, ticket) -> bool:
+        if ticket[0] > self.free_mb:
+            return False
+        for ahead in self._waiting:
+            if ahead is ticket:
+                return True
+            if ahead[1] >= self.max_bypass:
+                return False  # an older request has waited long enough
+        return True
+
+    def in_use_mb(self) -> int:
+        return self.total_mb - self.free_mb
+
+
+class JvmSlot:
+    """A granted job slot: JVM options to use and a place to report how the job ended."""
+
+    def __init__(self, estimate: JobEstimate):
+        self.heap_mb = estimate.heap_mb
+        self.timeout = estimate.timeout_sec
+        self.java_opts = [f"-Xmx{estimate.heap_mb}m"]
+        self.ok = True
+        self.oom = False
+        self.timed_out = False
+
+    def failed(self, stderr: str = "", timed_out: bool = False):
+        self.ok = False
+        self.oom = "OutOfMemoryError" in stderr
+        self.timed_out = timed_out
+
+
+class JvmScheduler:
+    """Sizes JVM jobs from their inputs and runs them only while they fit in the memory budget."""
+
+    def __init__(self, budget_mb: int, history_path: Optional[Path] = None,
+                 models: Optional[Dict[str, dict]] = None):
+        self.budget = MemoryBudget(budget_mb)
+        self.history = JobHistory(history_path)
+        self.models = {kind: ResourceModel(**params) for kind, params in (models or DEFAULT_MODELS).items()}
+        for kind, model in self.models.items():
+            model.fit(self.history.records.get(kind, []))
+        self._lock = threading.Lock()
+        self._since_fit = defaultdict(int)
+
+    def estimate(self, kind: str, files: int, size_bytes: int = 0) -> JobEstimate:
+        with self._lock:
+            return self.models[kind].estimate(files, size_bytes)
+
+    @contextmanager
+    def slot(self, kind: str, files: int, size_bytes: int = 0):
+        """Wait for memory, yield a JvmSlot sized for the job, then record how long it took."""
+        slot = JvmSlot(self.estimate(kind, files, size_bytes))
+        with self.budget.reserve(slot.heap_mb + JVM_OVERHEAD_MB):
+            t0 = time.time()
+            try:
+                yield slot
+            finally:
+                self._observe(kind, files, size_bytes, slot, time.time() - t0)
+
+    def hold(self, heap_mb: int) -> int:
+        """Reserve memory for a long-lived JVM of `heap_mb` until `release` is called with the returned amount."""
+        return self.budget.acquire(heap_mb + JVM_OVERHEAD_MB)
+
+    def release(self, mb: int):
+        self.budget.release(mb)
+
+    @contextmanager
+    def track(self, kind: str, files: int, size_bytes: int = 0, heap_mb: Optional[int] = None):
+        """Like `slot` for a job sent to a JVM that already holds its memory: no reservation, only the
+        estimated timeout and the history record. `heap_mb` is the heap that JVM runs with."""
+        estimate = self.estimate(kind, files, size_bytes)
+        slot = JvmSlot(estimate._replace(heap_mb=heap_mb) if heap_mb else estimate)
+        t0 = time.time()
+        try:
+            yield slot
+        finally:
+            self._observe(kind, files, size_bytes, slot, time.time() - t0)
+
+    def _observe(self, kind: str, files: int, size_bytes: int, slot: JvmSlot, runtime: float):
+        self.history.add({
+            "kind": kind, "files": files, "bytes": size_bytes, "heap_mb": slot.heap_mb,
+            "runtime_sec": round(runtime, 2), "ok": slot.ok, "oom": slot.oom, "timed_out": slot.timed_out,
+        })
+        with self._lock:
+            self._since_fit[kind] += 1
+            if slot.oom or self._since_fit[kind] >= MIN_HISTORY:
+                self._since_fit[kind] = 0
+                self.models[kind].fit(self.history.records[kind])
+
+    def max_concurrent(self, heap_mb: int) -> int:
+        """How many JVMs of `heap_mb` fit in the budget at once (at least one)."""
+        return max(1, self.budget.total_mb // (heap_mb + JVM_OVERHEAD_MB))
@@ -2,18 +2,18 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+import catalog
+
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 DATA_PATH = PROJECT_ROOT / "data" /  "smell_deltas_per_commit.csv"
 OUT_DIR = PROJECT_ROOT / "outputs" / "plots"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-df = pd.read_csv(DATA_PATH)
-print(f"Loaded {len(df)} rows")
+con = catalog.connect(DATA_PATH.parent)
 
-# Ensure numeric columns are parsed correctly
-df["delta"] = pd.to_numeric(df["delta"], errors="coerce")
-df["smells_before"] = pd.to_numeric(df["smells_before"], errors="coerce")
-df["smells_after"] = pd.to_numeric(df["smells_after"], errors="coerce")
+# The boxplot needs every delta; the other plots only need per-agent aggregates
+df = con.execute("SELECT agent, TRY_CAST(delta AS DOUBLE) AS delta FROM smell_deltas").df()
+print(f"Loaded {len(df)} rows")
 
 #Boxplot of smell deltas
 plt.figure(figsize=(8, 6))
@@ -28,7 +28,7 @@ plt.savefig(OUT_DIR / "smell_deltas_boxplot.png", dpi=300)
 plt.close()
 
 #Bar graph of a vs b per agent
-grouped = df.groupby("agent")[["smells_before", "smells_after"]].mean().reset_index()
+grouped = catalog.smell_means_by_agent(con)
 
 x = range(len(grouped))
 width = 0.35
@@ -47,22 +47,7 @@ plt.savefig(OUT_DIR / "smells_before_after_bargraph.png", dpi=300)
 plt.close()
 
 #Stacked barplot of rates of smell change types by agent
-def categorize(delta):
-    if delta < 0:
-        return "Decreased Smells"
-    elif delta == 0:
-        return "No Change"
-    else:
-        return "Increased Smells"
-
-df["category"] = df["delta"].apply(categorize)
-
-counts = (
-    df.groupby(["agent", "category"])
-    .size()
-    .unstack(fill_value=0)
-)
-proportions = counts.div(counts.sum(axis=1), axis=0)
+proportions = catalog.smell_change_by_agent(con)
 
 agents_order = [a for a in proportions.index if a.lower() != "human"] + [
     a for a in proportions.index if a.lower() == "human"
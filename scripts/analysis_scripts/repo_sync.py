@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Set
+
+from tqdm import tqdm
+
+
+class SyncTarget(NamedTuple):
+    repo: Path
+    full_name: str
+    shas: Set[str]
+
+
+def missing_commits(repo: Path, shas: Iterable[str]) -> Set[str]:
+    """SHAs from `shas` that are not commits in the local object database of `repo`."""
+    shas = list(shas)
+    if not shas:
+        return set()
+    result = subprocess.run(
+        ["git", "-C", str(repo), "cat-file", "--batch-check=%(objectname) %(objecttype)"],
+        input="".join(f"{sha}^{{commit}}\n" for sha in shas).encode(),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    if result.returncode != 0:
+        return set(shas)
+    lines = result.stdout.decode(errors="ignore").splitlines()
+    # One output line per input line, in order; anything but "<oid> commit" is missing.
+    return {sha for sha, line in zip(shas, lines) if not line.endswith(" commit")}
+
+
+class SyncManifest:
+    """Per-repository fetch state ({repo path: {full_name, last_fetched, commits}}) kept in a JSON file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.repos: Dict[str, dict] = {}
+        if path.exists():
+            try:
+                self.repos = json.loads(path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                logging.warning(f"Ignoring unreadable sync manifest {path}")
+
+    def known_commits(self, repo: Path) -> Set[str]:
+        return set(self.repos.get(str(repo), {}).get("commits", []))
+
+    def record(self, repo: Path, full_name: str, commits: Iterable[str], fetched: bool):
+        with self._lock:
+            entry = self.repos.setdefault(str(repo), {"full_name": full_name, "last_fetched": None, "commits": []})
+            if fetched:
+                entry["last_fetched"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            entry["commits"] = sorted(set(entry["commits"]) | set(commits))
+
+    def save(self):
+        with self._lock:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.repos, indent=1, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+def sync_repo(target: SyncTarget, manifest: SyncManifest, force: bool = False) -> bool:
+    """Clone or fetch `target.repo` only if some of its SHAs are not local yet. False if the repo is unusable."""
+    repo, full_name = target.repo, target.full_name
+    if not repo.exists():
+        url = f"https://github.com/{full_name}.git"
+        logging.warning(f"Repo not found for {full_name}. Cloning...")
+        result = subprocess.run(["git", "clone", url, str(repo)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=600)
+        if result.returncode != 0:
+            logging.error(f"Failed to clone {url}: {result.stderr.decode(errors='ignore')[:300]}")
+            return False
+        fetched = True
+    else:
+        wanted = target.shas if force else target.shas - manifest.known_commits(repo)
+        if not force and not missing_commits(repo, wanted):
+            manifest.record(repo, full_name, target.shas, fetched=False)
+            return True
+        try:
+            result = subprocess.run(["git", "-C", str(repo), "fetch", "--all"],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=300)
+            if result.returncode != 0:
+                logging.warning(f"git fetch failed for {repo}: {result.stderr.decode(errors='ignore')[:300]}")
+        except subprocess.TimeoutExpired:
+            logging.warning(f"git fetch timed out for {repo}")
+        fetched = True
+
+    still_missing = missing_commits(repo, target.shas)
+    if still_missing:
+        logging.warning(f"{full_name}: {len(still_missing)} commits not available after sync")
+    manifest.record(repo, full_name, target.shas - still_missing, fetched=fetched)
+    return True
+
+
+def sync_repos(targets: Iterable[SyncTarget], manifest: SyncManifest, workers: int = 4,
+               force: bool = False) -> Set[Path]:
+    """Sync every repository once, `workers` at a time, and return the ones that are usable."""
+    targets = list(targets)
+    ready = set()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(sync_repo, t, manifest, force): t for t in targets}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Syncing repositories"):
+            target = futures[fut]
+            try:
+                if fut.result():
+                    ready.add(target.repo)
+            except Exception as e:
+                logging.error(f"❌ Sync failed for {target.full_name}: {e}")
+    manifest.save()
+    return ready
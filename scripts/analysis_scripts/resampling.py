@@ -0,0 +1,180 @@
+"""Bootstrap confidence intervals and permutation tests, vectorized over resamples.
+
+Resamples are drawn as index matrices (one row per resample) and evaluated a
+`chunk_size` rows at a time, so memory stays at chunk_size * (n + m) indices
+whatever the number of resamples. Chunks get their own seeds spawned from
+`seed`, which makes the results identical with or without worker processes.
+
+Cliff's delta is never computed pairwise:
+
+- bootstrap: the reference sample is sorted once; a resample of it becomes a
+  row of counts per sorted position, whose cumulative sum gives, for any x,
+  how many resampled y lie below / above it (see effect_sizes.py).
+- permutation: the pooled sample keeps the same values under any relabelling,
+  so its midranks are computed once and delta follows from the rank sum of
+  the permuted x positions (delta = 2U / (n m) - 1).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from effect_sizes import cliffs_delta
+
+BOOTSTRAP_STATS = ("median", "mean", "median_diff", "mean_diff", "cliffs_delta")
+PERMUTATION_STATS = ("median_diff", "mean_diff", "cliffs_delta")
+
+
+def _clean(values) -> np.ndarray:
+    arr = np.asarray(values, dtype=float)
+    return arr[~np.isnan(arr)]
+
+
+def _chunks(n_resamples: int, chunk_size: int) -> List[int]:
+    full, rest = divmod(n_resamples, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+def _bootstrap_chunk(x: np.ndarray, y_sorted: np.ndarray, size: int, seed) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    n, m = len(x), len(y_sorted)
+    ix = rng.integers(0, n, size=(size, n))
+    iy = rng.integers(0, m, size=(size, m))
+    xb, yb = x[ix], y_sorted[iy]
+
+    # counts[b, k]: draws of sorted position k in resample b; below[b, k]: draws of positions < k
+    counts = np.bincount((iy + m * np.arange(size)[:, None]).ravel(), minlength=size * m).reshape(size, m)
+    below = np.zeros((size, m + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=below[:, 1:])
+    left = np.searchsorted(y_sorted, x, side="left")[ix]
+    right = np.searchsorted(y_sorted, x, side="right")[ix]
+    greater = np.take_along_axis(below, left, axis=1).sum(axis=1)
+    less = (m - np.take_along_axis(below, right, axis=1)).sum(axis=1)
+
+    median_x, median_y = np.median(xb, axis=1), np.median(yb, axis=1)
+    mean_x, mean_y = xb.mean(axis=1), yb.mean(axis=1)
+    return {
+        "median": median_x, "mean": mean_x,
+        "ref_median": median_y, "ref_mean": mean_y,
+        "median_diff": median_x - median_y, "mean_diff": mean_x - mean_y,
+        "cliffs_delta": (greater - less) / (n * m),
+    }
+
+
+def _permutation_chunk(x: np.ndarray, y: np.ndarray, size: int, seed) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    pooled = np.concatenate([x, y])
+    n, m = len(x), len(y)
+    perm = rng.permuted(np.tile(np.arange(n + m), (size, 1)), axis=1)
+    xs, ys = pooled[perm[:, :n]], pooled[perm[:, n:]]
+    ranks = rankdata(pooled)
+    u = ranks[perm[:, :n]].sum(axis=1) - n * (n + 1) / 2
+    return {
+        "median_diff": np.median(xs, axis=1) - np.median(ys, axis=1),
+        "mean_diff": xs.mean(axis=1) - ys.mean(axis=1),
+        "cliffs_delta": 2 * u / (n * m) - 1,
+    }
+
+
+def _observed(x: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    return {
+        "median": np.median(x), "mean": x.mean(),
+        "ref_median": np.median(y), "ref_mean": y.mean(),
+        "median_diff": np.median(x) - np.median(y), "mean_diff": x.mean() - y.mean(),
+        "cliffs_delta": cliffs_delta(x, y),
+    }
+
+
+class Resampler:
+    """Bootstrap CIs and permutation p-values of groups against a reference sample.
+
+    `workers > 1` evaluates chunks in a process pool; scripts that use it must
+    guard their entry point with `if __name__ == "__main__"` on platforms that
+    spawn processes.
+    """
+
+    def __init__(self, n_resamples: int = 10_000, chunk_size: int = 1_000, seed: int = 0, workers: int = 1):
+        self.n_resamples = n_resamples
+        self.chunk_size = max(1, chunk_size)
+        self.seed = seed
+        self.workers = workers
+
+    def _run(self, fn, jobs: List[Tuple[str, np.ndarray, np.ndarray]]) -> Dict[str, Dict[str, np.ndarray]]:
+        """Run `fn` over every (group, chunk); returns the resampled statistics per group."""
+        sizes = _chunks(self.n_resamples, self.chunk_size)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(jobs) * len(sizes))
+        tasks = [(fn, x, y, size, seeds[g * len(sizes) + c])
+                 for g, (_, x, y) in enumerate(jobs) for c, size in enumerate(sizes)]
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                parts = list(pool.map(_call, tasks))
+        else:
+            parts = [_call(task) for task in tasks]
+        out = {}
+        for g, (name, _, _) in enumerate(jobs):
+            chunk_parts = parts[g * len(sizes):(g + 1) * len(sizes)]
+            out[name] = {k: np.concatenate([p[k] for p in chunk_parts]) for k in chunk_parts[0]}
+        return out
+
+    def _jobs(self, groups: Dict[str, Iterable[float]], reference, sort_reference: bool):
+        ref = _clean(reference)
+        if sort_reference:
+            ref = np.sort(ref)
+        return [(name, _clean(values), ref) for name, values in groups.items()]
+
+    @staticmethod
+    def _usable(jobs):
+        return [(name, x, y) for name, x, y in jobs if len(x) and len(y)]
+
+    def bootstrap(self, groups: Dict[str, Iterable[float]], reference, level: float = 0.95,
+                  stats: Iterable[str] = BOOTSTRAP_STATS) -> pd.DataFrame:
+        """Percentile CIs of each group's median/mean and of its difference to and Cliff's delta against `reference`.
+
+        One row per (group, statistic), plus rows for the reference's own
+        median and mean (group "reference"), estimated from the resamples of
+        the first group. Groups without values (or an empty reference) get NaN rows.
+        """
+        jobs = self._jobs(groups, reference, sort_reference=True)
+        usable = self._usable(jobs)
+        resampled = self._run(_bootstrap_chunk, usable)
+        alpha = (1 - level) / 2
+        rows = []
+        for name, x, y in jobs:
+            observed = _observed(x, y) if name in resampled else {}
+            wanted = [(name, s, s) for s in stats]
+            if usable and name == usable[0][0]:
+                wanted += [("reference", "median", "ref_median"), ("reference", "mean", "ref_mean")]
+            for group, stat, key in wanted:
+                if name in resampled:
+                    low, high = np.quantile(resampled[name][key], [alpha, 1 - alpha])
+                else:
+                    low = high = np.nan
+                rows.append({"group": group, "statistic": stat, "estimate": observed.get(key, np.nan),
+                             "ci_low": low, "ci_high": high, "level": level, "n_resamples": self.n_resamples})
+        return pd.DataFrame(rows)
+
+    def permutation_test(self, groups: Dict[str, Iterable[float]], reference,
+                         stats: Iterable[str] = PERMUTATION_STATS) -> pd.DataFrame:
+        """Two-sided permutation p-values of each group against `reference` for every statistic (NaN if empty)."""
+        jobs = self._jobs(groups, reference, sort_reference=False)
+        resampled = self._run(_permutation_chunk, self._usable(jobs))
+        rows = []
+        for name, x, y in jobs:
+            if name not in resampled:
+                rows += [{"group": name, "statistic": stat, "estimate": np.nan, "p_value": np.nan,
+                          "n_resamples": self.n_resamples} for stat in stats]
+                continue
+            observed = _observed(x, y)
+            for stat in stats:
+                null = resampled[name][stat]
+                extreme = np.count_nonzero(np.abs(null) >= abs(observed[stat]) - 1e-12)
+                rows.append({"group": name, "statistic": stat, "estimate": observed[stat],
+                             "p_value": (extreme + 1) / (len(null) + 1), "n_resamples": self.n_resamples})
+        return pd.DataFrame(rows)
+
+
+def _call(task):
+    fn, *args = task
+    return fn(*args)
@@ -0,0 +1,135 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+PACKAGE_DECL = re.compile(rb"^\s*package\s+([\w.]+)\s*;", re.M)
+TYPE_DECL = re.compile(rb"\b(?:class|interface|enum|record)\s+([A-Za-z_$][\w$]*)")
+IMPORT_DECL = re.compile(rb"^\s*import\s+(?:static\s+)?([\w.]+?)(?:\.\*)?\s*;", re.M)
+
+
+def smell_csvs(output_dir: Path) -> Iterable[Path]:
+    """Designite CSVs that list smells (metrics and summaries are skipped, as in count_smells)."""
+    for csv in sorted(output_dir.glob("*.csv")):
+        if "Metric" in csv.name or "Summary" in csv.name:
+            continue
+        yield csv
+
+
+def smell_type_column(columns: Iterable[str]) -> Optional[str]:
+    """The column naming the smell ("Code Smell", "Implementation Smell", ...)."""
+    for col in columns:
+        if col.strip().endswith("Smell") and not col.startswith("Cause"):
+            return col
+    return None
+
+
+def declared_types(source: bytes) -> Tuple[str, set]:
+    """(package, declared type names) of a Java source file, by a lightweight regex scan."""
+    pkg = PACKAGE_DECL.search(source)
+    names = {m.group(1).decode() for m in TYPE_DECL.finditer(source)}
+    return (pkg.group(1).decode() if pkg else ""), names
+
+
+def imported_packages(source: bytes) -> set:
+    """Every package an import of `source` may point into (all dotted prefixes of the imported names)."""
+    out = set()
+    for m in IMPORT_DECL.finditer(source):
+        parts = m.group(1).decode().split(".")
+        out.update(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+    return out
+
+
+class TypeIndex:
+    """Maps Designite (package, type) rows back to the subset file that declares the type."""
+
+    def __init__(self):
+        self.by_qualified: Dict[Tuple[str, str], str] = {}
+        self.by_name: Dict[str, set] = defaultdict(set)
+        self.written: set = set()  # every file actually materialized, with or without types
+
+    def add(self, fpath: str, source: bytes):
+        self.written.add(fpath)
+        pkg, names = declared_types(source)
+        for name in names:
+            self.by_qualified.setdefault((pkg, name), fpath)
+            self.by_name[name].add(fpath)
+
+    def lookup(self, package: str, type_name: str) -> Optional[str]:
+        if not isinstance(type_name, str):
+            return None
+        package = package if isinstance(package, str) else ""
+        for name in (type_name, type_name.split(".")[0], type_name.split(".")[-1]):
+            if (package, name) in self.by_qualified:
+                return self.by_qualified[(package, name)]
+        candidates = self.by_name.get(type_name.split(".")[-1], set())
+        return next(iter(candidates)) if len(candidates) == 1 else None
+
+
+def attribute_smells(output_dir: Path, index: TypeIndex) -> Tuple[Dict[str, Counter], int]:
+    """Per-file {smell type: count} from one Designite run, plus the number of rows tied to no single file."""
+    per_file: Dict[str, Counter] = defaultdict(Counter)
+    unattributed = 0
+    for csv in smell_csvs(output_dir):
+        try:
+            df = pd.read_csv(csv)
+        except Exception as e:
+            logging.warning(f"Could not read {csv.name}: {e}")
+            continue
+        smell_col = smell_type_column(df.columns)
+        if smell_col is None or "Type Name" not in df.columns:
+            unattributed += len(df)
+            continue
+        packages = df["Package Name"] if "Package Name" in df.columns else [""] * len(df)
+        for package, type_name, smell in zip(packages, df["Type Name"], df[smell_col]):
+            fpath = index.lookup(package, type_name)
+            if fpath is None:
+                unattributed += 1
+            else:
+                per_file[fpath][str(smell)] += 1
+    return per_file, unattributed
+
+
+class SmellCache:
+    """Persistent {blob id: {smell type: count}} cache, appended to a JSON Lines file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, int]] = {}
+        self.hits = 0
+        self.misses = 0
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["blob"]] = entry["smells"]
+
+    def get(self, blob: str) -> Optional[Dict[str, int]]:
+        return self.entries.get(blob)
+
+    def split(self, files: Dict[str, str]) -> Dict[str, str]:
+        """Return the {path: blob} entries of `files` that are not cached yet."""
+        missing = {p: b for p, b in files.items() if b not in self.entries}
+        with self._lock:
+            self.hits += len(files) - len(missing)
+            self.misses += len(missing)
+        return missing
+
+    def put_many(self, smells_by_blob: Dict[str, Dict[str, int]]):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for blob, smells in smells_by_blob.items():
+                    f.write(json.dumps({"blob": blob, "smells": smells}) + "\n")
+                    self.entries[blob] = smells
+
+    def total(self, files: Dict[str, str]) -> int:
+        return sum(sum(self.entries.get(b, {}).values()) for b in files.values())
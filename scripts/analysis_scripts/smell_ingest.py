@@ -0,0 +1,189 @@
+import os
+import threading
+from pathlib import Path
+from typing import Hashable, List, Tuple
+
+import duckdb
+import pandas as pd
+
+from smell_cache import smell_csvs
+
+
+def _quote(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class SmellRuns:
+    """Designite output dirs of one analysis run and the (row, side) each of their smells belongs to.
+
+    A plain run belongs entirely to one side of one commit. A batched run is
+    split by subset: rows are matched by the file that declares the type, or
+    by package when no file is known.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.plain: List[Tuple[str, int, str]] = []
+        self.roots: List[Tuple[str, str, int, str]] = []
+        self.packages: List[Tuple[str, str, int, str]] = []
+
+    def add_run(self, output_dir: Path, key: Tuple[Hashable, str]):
+        with self._lock:
+            self.plain.append((str(output_dir), *key))
+
+    def add_batch(self, output_dir: Path, batch):
+        with self._lock:
+            for subset in batch.subsets:
+                row_id, side = subset.key
+                self.roots.append((str(output_dir), str(subset.path) + os.sep, row_id, side))
+                for pkg in subset.packages:
+                    self.packages.append((str(output_dir), pkg, row_id, side))
+
+    def drain(self) -> "SmellRuns":
+        """Move everything registered so far into a new SmellRuns (e.g. to ingest it while runs continue)."""
+        drained = SmellRuns()
+        with self._lock:
+            drained.plain, self.plain = self.plain, []
+            drained.roots, self.roots = self.roots, []
+            drained.packages, self.packages = self.packages, []
+        return drained
+
+    def output_dirs(self) -> List[str]:
+        return sorted({r[0] for r in self.plain} | {r[0] for r in self.roots})
+
+
+def _scan(con, files: pd.DataFrame, name: str):
+    """One multi-file scan of `files.csv` into view `name`, tagged with each row's output_dir and kind."""
+    con.register(f"{name}_files", files)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP VIEW {name} AS
+        SELECT f.output_dir, f.kind, raw.* EXCLUDE (filename)
+        FROM read_csv([{", ".join(map(_literal, files["csv"]))}], union_by_name = true, filename = true, all_varchar = true, header = true) raw
+        JOIN {name}_files f ON raw.filename = f.csv
+    """)
+    return [c for c in con.execute(f"DESCRIBE {name}").df()["column_name"] if c not in ("output_dir", "kind")]
+
+
+def _first(columns, *names) -> str:
+    for name in names:
+        if name in columns:
+            return _quote(name)
+    return "NULL"
+
+
+def open_smell_records() -> "duckdb.DuckDBPyConnection":
+    """In-memory DuckDB connection with an empty `smells` table.
+
+    Columns: row_id, side, kind, smell_type, package, entity, file. Rows that
+    match no commit side have a NULL row_id.
+    """
+    con = duckdb.connect()
+    con.execute("""CREATE TABLE smells (row_id BIGINT, side VARCHAR, kind VARCHAR,
+                   smell_type VARCHAR, package VARCHAR, entity VARCHAR, file VARCHAR)""")
+    return con
+
+
+def ingest_smell_records(con, runs: SmellRuns):
+    """Scan every Designite smell CSV of `runs` at once and append its rows to `smells`."""
+    smell_files, metric_files = [], []
+    for output_dir in runs.output_dirs():
+        out = Path(output_dir)
+        for csv in smell_csvs(out):
+            if csv.stat().st_size:
+                kind = csv.stem.lower().replace("codesmells", "").replace("smells", "") or "other"
+                smell_files.append((str(csv), output_dir, kind))
+        for csv in out.glob("*.csv"):
+            if "typemetrics" in csv.name.lower() and csv.stat().st_size:
+                metric_files.append((str(csv), output_dir, "metrics"))
+
+    con.register("plain_runs", pd.DataFrame(runs.plain, columns=["output_dir", "row_id", "side"]))
+    con.register("batch_roots", pd.DataFrame(runs.roots, columns=["output_dir", "root", "row_id", "side"]))
+    con.register("batch_packages", pd.DataFrame(runs.packages, columns=["output_dir", "package", "row_id", "side"]))
+
+    if not smell_files:
+        return
+
+    cols = _scan(con, pd.DataFrame(smell_files, columns=["csv", "output_dir", "kind"]), "raw_smells")
+    smell_cols = [c for c in cols if c.strip().endswith("Smell") and not c.startswith("Cause")]
+    smell_type = f"coalesce({', '.join(map(_quote, smell_cols))})" if smell_cols else "NULL"
+    package, type_name = _first(cols, "Package Name"), _first(cols, "Type Name")
+    method = _first(cols, "Method Name")
+    own_file = _first(cols, "File path", "File Path")
+
+    if metric_files:
+        mcols = _scan(con, pd.DataFrame(metric_files, columns=["csv", "output_dir", "kind"]), "raw_metrics")
+        mfile = _first(mcols, "File path", "File Path")
+        con.execute(f"""
+            CREATE OR REPLACE TEMP VIEW type_files AS
+            SELECT output_dir, {_first(mcols, "Package Name")} AS package, {_first(mcols, "Type Name")} AS type_name,
+                   any_value({mfile}) AS file
+            FROM raw_metrics GROUP BY ALL
+        """)
+    else:
+        con.execute("""CREATE OR REPLACE TEMP VIEW type_files AS
+                       SELECT NULL::VARCHAR AS output_dir, NULL::VARCHAR AS package,
+                              NULL::VARCHAR AS type_name, NULL::VARCHAR AS file WHERE false""")
+
+    con.execute(f"""
+        INSERT INTO smells
+        WITH r AS (
+            SELECT output_dir, kind, {smell_type} AS smell_type, {package} AS package, {type_name} AS type_name,
+                   concat_ws('.', {package}, {type_name}, {method}) AS entity, {own_file} AS own_file
+            FROM raw_smells
+        ), located AS (
+            SELECT r.*, coalesce(r.own_file, t.file) AS file,
+                   -- Designite names the default package with a placeholder such as "<All packages>"
+                   CASE WHEN regexp_full_match(coalesce(r.package, ''), '[A-Za-z_$][\\w$]*(\\.[A-Za-z_$][\\w$]*)*')
+                        THEN r.package ELSE '' END AS package_key
+            FROM r LEFT JOIN type_files t
+              ON r.output_dir = t.output_dir AND r.package IS NOT DISTINCT FROM t.package
+             AND r.type_name IS NOT DISTINCT FROM t.type_name
+        )
+        SELECT coalesce(p.row_id, f.row_id, k.row_id) AS row_id, coalesce(p.side, f.side, k.side) AS side,
+               l.kind, l.smell_type, l.package, l.entity, l.file
+        FROM located l
+        LEFT JOIN plain_runs p ON l.output_dir = p.output_dir
+        LEFT JOIN batch_roots f ON l.output_dir = f.output_dir AND starts_with(l.file, f.root)
+        LEFT JOIN batch_packages k ON l.output_dir = k.output_dir AND l.package_key = k.package
+    """)
+
+
+def write_smell_records(con, commits: pd.DataFrame, dest: Path):
+    """Write `smells` joined to `commits` (row_id, dataset, agent, repo, commit) as Parquet partitioned by commit/side."""
+    con.register("commits", commits)
+    con.execute(f"""
+        COPY (
+            SELECT c.dataset, c.agent, c.repo, c."commit", s.side, s.kind, s.smell_type, s.entity, s.file
+            FROM smells s JOIN commits c USING (row_id)
+        ) TO {_literal(dest.as_posix())} (FORMAT parquet, PARTITION_BY ("commit", side), OVERWRITE true)
+    """)
+
+
+def smell_totals(con) -> pd.DataFrame:
+    """Smells per commit: row_id, smells_before, smells_after."""
+    return con.execute("""
+        SELECT row_id,
+               count(*) FILTER (WHERE side = 'before') AS smells_before,
+               count(*) FILTER (WHERE side = 'after') AS smells_after
+        FROM smells WHERE row_id IS NOT NULL GROUP BY row_id
+    """).df()
+
+
+def smell_type_deltas(con) -> pd.DataFrame:
+    """Smells per commit and smell type: row_id, kind, smell_type, smells_before, smells_after, delta."""
+    return con.execute("""
+        SELECT row_id, kind, smell_type,
+               count(*) FILTER (WHERE side = 'before') AS smells_before,
+               count(*) FILTER (WHERE side = 'after') AS smells_after,
+               smells_after - smells_before AS delta
+        FROM smells WHERE row_id IS NOT NULL
+        GROUP BY ALL ORDER BY row_id, kind, smell_type
+    """).df()
+
+
+def unmatched_count(con) -> int:
+    return con.execute("SELECT count(*) FROM smells WHERE row_id IS NULL").fetchone()[0]
@@ -1,9 +1,21 @@
 import pandas as pd
+from pathlib import Path
 from scipy.stats import mannwhitneyu
 import numpy as np
 
+from effect_sizes import batched_dominance, interpret_delta
+from resampling import Resampler
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DATA_PATH = PROJECT_ROOT / "data" / "smell_deltas_per_commit.csv"
+TABLES_DIR = PROJECT_ROOT / "outputs" / "tables"
+TABLES_DIR.mkdir(parents=True, exist_ok=True)
+
+N_RESAMPLES = 10_000
+SEED = 42
+
 #Load data
-df = pd.read_csv("G:\msr-mining-challenge-2026\data\processed\smell_deltas_per_commit.csv")
+df = pd.read_csv(DATA_PATH)
 
 #Separate human and agentic data
 human = df[df["agent"] == "Human"]["delta"].dropna()
@@ -11,27 +23,16 @@ human = df[df["agent"] == "Human"]["delta"].dropna()
 #Get unique agent names (excluding Human)
 agents = df[df["agent"] != "Human"]["agent"].unique()
 
-#Function to compute Cliff's delta
-def cliffs_delta(x, y):
-    """Compute Cliff's delta for two independent samples."""
-    n1, n2 = len(x), len(y)
-    # Pairwise comparisons
-    greater = sum(a > b for a in x for b in y)
-    less = sum(a < b for a in x for b in y)
-    delta = (greater - less) / (n1 * n2)
-    return delta
+#Cliff's delta of every agent against the human deltas, in one sort-based pass
+agent_deltas = {agent: df[df["agent"] == agent]["delta"] for agent in agents}
+dominance = batched_dominance(agent_deltas, human)
+cliffs = dict(zip(dominance["group"], dominance["cliffs_delta"]))
 
-#Function to interpret Cliff's delta
-def interpret_delta(delta):
-    abs_d = abs(delta)
-    if abs_d < 0.147:
-        return "negligible"
-    elif abs_d < 0.33:
-        return "small"
-    elif abs_d < 0.474:
-        return "medium"
-    else:
-        return "large"
+#Bootstrap CIs (medians, means, Cliff's delta) and permutation p-values for all agents
+resampler = Resampler(n_resamples=N_RESAMPLES, seed=SEED)
+ci = resampler.bootstrap(agent_deltas, human)
+perm = resampler.permutation_test(agent_deltas, human)
+delta_ci = ci[ci["statistic"] == "cliffs_delta"].set_index("group")
 
 #Run tests for each agent vs human
 results = []
@@ -42,7 +43,7 @@ for agent in agents:
     stat, p_value = mannwhitneyu(human, agent_data, alternative='two-sided')
 
 #Cliff's delta
-    delta = cliffs_delta(agent_data.values, human.values)
+    delta = cliffs[agent]
     interpretation = interpret_delta(delta)
 
     results.append({
@@ -50,6 +51,8 @@ for agent in agents:
         "U-statistic": stat,
         "p-value": p_value,
         "Cliffs_delta": delta,
+        "Cliffs_delta_CI_low": delta_ci.loc[agent, "ci_low"],
+        "Cliffs_delta_CI_high": delta_ci.loc[agent, "ci_high"],
         "Effect_size": interpretation,
         "Human_median": human.median(),
         f"{agent}_median": agent_data.median(),
@@ -61,4 +64,8 @@ for agent in agents:
 
 #Convert to DataFrame
 results_df = pd.DataFrame(results)
-print(results_df)
\ No newline at end of file
+print(results_df)
+
+ci.to_csv(TABLES_DIR / "smell_delta_bootstrap_ci.csv", index=False)
+perm.to_csv(TABLES_DIR / "smell_delta_permutation_tests.csv", index=False)
+print(f"\nBootstrap CIs and permutation tests ({N_RESAMPLES} resamples) saved to {TABLES_DIR}")
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""catalog.connect over both shapes of the RefactoringMiner tables.
+
+Run with `python -m pytest scripts/analysis_scripts`.
+"""
+import pandas as pd
+
+import catalog
+
+COMMITS = pd.DataFrame({
+    "sha": ["AAA ", "bbb", "ccc"], "pr_id": [1, 2, 3], "number": [10, 20, 30],
+    "full_name": ["o/a", "o/b", "o/c"], "agent": ["Copilot", "Devin", "Human"],
+    "refactoring_count": [2, 1, 1], "has_refactoring": [True, True, True],
+})
+
+
+def _write(data_dir, agentic_refs, baseline_refs):
+    data_dir.mkdir(parents=True, exist_ok=True)
+    COMMITS.iloc[:2].to_parquet(data_dir / "agentic_refactoring_commits.parquet", index=False)
+    COMMITS.iloc[2:].to_parquet(data_dir / "baseline_refactoring_commits.parquet", index=False)
+    COMMITS.iloc[2:].to_parquet(data_dir / "baseline_refactoring_commits_normalized.parquet", index=False)
+    agentic_refs.to_parquet(data_dir / "agentic_refactorings.parquet", index=False)
+    baseline_refs.to_parquet(data_dir / "baseline_refactorings.parquet", index=False)
+
+
+def _events(data_dir):
+    con = catalog.connect(data_dir)
+    return con.execute("SELECT * FROM refactoring_events ORDER BY sha, refactoring_type").df()
+
+
+EXPECTED = pd.DataFrame({
+    "sha": ["aaa", "aaa", "bbb", "ccc"],
+    "full_name": ["o/a", "o/a", "o/b", "o/c"],
+    "agent": ["Copilot", "Copilot", "Devin", "Human"],
+    "refactoring_type": ["Extract Method", "Rename Variable", "Move Class", "Extract Method"],
+    "dataset": ["Agentic", "Agentic", "Agentic", "Human"],
+})
+
+
+def test_shipped_schema(tmp_path):
+    """Shipped files: `commit_sha`/`agent_type`, attributed through the commit tables."""
+    refs = pd.DataFrame({
+        "agent_type": ["x", "x", "x", None], "repo_name": ["r"] * 4,
+        "commit_sha": ["aaa", "AAA", "bbb", "ccc"],
+        "refactoring_type": ["Extract Method", "Rename Variable", "Move Class", "Extract Method"],
+    })
+    _write(tmp_path, refs.iloc[:3], refs.iloc[3:])
+    pd.testing.assert_frame_equal(_events(tmp_path), EXPECTED)
+
+
+def test_builder_schema(tmp_path):
+    """build_agentic_dataset.py / build_baseline_dataset.py output under data/processed."""
+    agentic = pd.DataFrame({
+        "sha": ["aaa", "aaa", "bbb", "bbb"], "repo_url_rm": ["u"] * 4, "repo_full_name_rm": ["o/x"] * 4,
+        "commit_url": ["c"] * 4, "description": [None] * 4,
+        "refactoring_type": ["Extract Method", "Rename Variable", "Move Class", None],
+        "pr_id": [1, 1, 2, 2], "number": [10, 10, 20, 20], "full_name": ["o/a", "o/a", "o/b", "o/b"],
+        "owner": ["o"] * 4, "repo": ["a", "a", "b", "b"], "agent": ["Copilot", "Copilot", "Devin", "Devin"],
+    })
+    baseline = pd.DataFrame({
+        "agent_type": [None], "repo_name": ["o/c"], "commit_sha": ["ccc"], "commit_url": ["c"],
+        "refactoring_type": ["Extract Method"], "description": [None],
+    })
+    _write(tmp_path / "processed", agentic, baseline)
+    pd.testing.assert_frame_equal(_events(tmp_path), EXPECTED)
+
+    baseline = baseline.rename(columns={"commit_sha": "sha"})
+    baseline.to_parquet(tmp_path / "processed" / "baseline_refactorings.parquet", index=False)
+    pd.testing.assert_frame_equal(_events(tmp_path), EXPECTED)
@@ -0,0 +1,99 @@
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+EST_FILE_BYTES = 32 << 10  # reservation per source file before its real size is known
+
+
+def dir_size(path: Path) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _fmt(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+class Workspace:
+    """Disk quota for Designite outputs kept until ingestion, plus an optional RAM-backed dir for small subsets.
+
+    Outputs are registered with `add_output` once Designite has written them and
+    removed with `evict` after their smells have been ingested. `over_quota()`
+    tells the caller when to ingest and evict. Subsets of at most
+    `ram_max_files` files are written under `ram_dir` while its reservations
+    stay below `ram_quota`.
+    """
+
+    def __init__(self, disk_root: Path, quota_bytes: int, ram_dir: Optional[Path] = None,
+                 ram_quota: int = 0, ram_max_files: int = 500):
+        self.disk_root = disk_root
+        self.quota_bytes = quota_bytes
+        self.ram_dir = ram_dir
+        self.ram_quota = ram_quota
+        self.ram_max_files = ram_max_files
+        self._lock = threading.Lock()
+        self.outputs: Dict[Path, int] = {}
+        self.ram_reserved = 0
+        self.peak_bytes = 0
+        self.evicted_bytes = 0
+        if ram_dir is not None:
+            ram_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def scratch(self, n_files: int):
+        """Directory to materialize a subset of `n_files` files in: RAM-backed if it fits, else the disk root."""
+        reserve = n_files * EST_FILE_BYTES
+        use_ram = False
+        if self.ram_dir is not None and n_files <= self.ram_max_files:
+            with self._lock:
+                if self.ram_reserved + reserve <= self.ram_quota:
+                    self.ram_reserved += reserve
+                    use_ram = True
+        try:
+            yield self.ram_dir if use_ram else self.disk_root
+        finally:
+            if use_ram:
+                with self._lock:
+                    self.ram_reserved -= reserve
+
+    def add_output(self, path: Path):
+        size = dir_size(path)
+        with self._lock:
+            self.outputs[path] = size
+            self.peak_bytes = max(self.peak_bytes, self.used_bytes())
+
+    def used_bytes(self) -> int:
+        return sum(self.outputs.values())
+
+    def over_quota(self) -> bool:
+        with self._lock:
+            return self.used_bytes() > self.quota_bytes
+
+    def evict(self, path: Path):
+        """Delete an output dir (ingested, or from a failed run)."""
+        shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            self.evicted_bytes += self.outputs.pop(path, 0)
+
+    def usage(self) -> str:
+        with self._lock:
+            text = f"{_fmt(self.used_bytes())}/{_fmt(self.quota_bytes)} outputs"
+            if self.ram_dir is not None:
+                text += f", {_fmt(self.ram_reserved)}/{_fmt(self.ram_quota)} RAM"
+            return text
+
+    def report(self):
+        logging.info(f"Workspace: {self.usage()}, peak {_fmt(self.peak_bytes)}, {_fmt(self.evicted_bytes)} evicted")
@@ -1,24 +1,49 @@
-import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from refminer_ingest import (
+    LOCATION_TYPE,
+    ParquetBatchWriter,
+    element_lists,
+    explode_refactorings,
+    iter_commit_batches,
+    map_distinct,
+    project_locations,
+    resolve_rm_output,
+)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-RM_JSON = PROJECT_ROOT / "data" / "processed" / "refminer_results" / "refminer_all.json"
+RM_JSON = PROJECT_ROOT / "data" / "processed" / "refminer_results" / "refminer_all.jsonl"
 META_PARQUET = PROJECT_ROOT / "data" / "processed" / "agentic_pr_commits.parquet"
 
 OUT_DIR = PROJECT_ROOT / "data" / "processed"
 COMMITS_OUT_DEDUPED = OUT_DIR / "agentic_refactoring_commits.parquet"
 REFACT_OUT = OUT_DIR / "agentic_refactorings.parquet"
 
-def _safe_list(x: Optional[Iterable]) -> List:
-    if x is None:
-        return []
-    if isinstance(x, list):
-        return x
-    return [x]
+META_COLS = ["pr_id", "number", "full_name", "owner", "repo", "agent"]
+REFACT_SCHEMA = pa.schema([
+    ("sha", pa.string()),
+    ("repo_url_rm", pa.string()),
+    ("repo_full_name_rm", pa.string()),
+    ("commit_url", pa.string()),
+    ("refactoring_type", pa.string()),
+    ("description", pa.string()),
+    ("left_locations", pa.list_(LOCATION_TYPE)),
+    ("right_locations", pa.list_(LOCATION_TYPE)),
+    ("left_elements", pa.list_(pa.string())),
+    ("right_elements", pa.list_(pa.string())),
+    ("pr_id", pa.int64()),
+    ("number", pa.int64()),
+    ("full_name", pa.string()),
+    ("owner", pa.string()),
+    ("repo", pa.string()),
+    ("agent", pa.string()),
+])
 
 def _norm_repo_name_from_url(url: str) -> str:
     if not isinstance(url, str):
@@ -32,106 +57,110 @@ def _norm_repo_name_from_url(url: str) -> str:
         return f"{parts[0]}/{parts[1].replace('.git','')}"
     return ""
 
-def _flatten_locations(loc_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    out = []
-    for loc in _safe_list(loc_list):
-        out.append({
-            "filePath": loc.get("filePath"),
-            "startLine": loc.get("startLine"),
-            "endLine": loc.get("endLine"),
-            "codeElement": loc.get("codeElement"),
-            "description": loc.get("description"),
-        })
-    return out
+def _owner_of(full_name: str) -> str:
+    return full_name.split("/")[0] if isinstance(full_name, str) and "/" in full_name else full_name
+
+def _repo_of(full_name: str) -> str:
+    return full_name.split("/")[1] if isinstance(full_name, str) and "/" in full_name else full_name
 
 print("Loading inputs...")
-if not RM_JSON.exists():
+rm_path = resolve_rm_output(RM_JSON)
+if rm_path is None:
     sys.exit(f"Missing RefactoringMiner JSON: {RM_JSON}")
 if not META_PARQUET.exists():
     sys.exit(f"Missing metadata parquet: {META_PARQUET}")
 
-with RM_JSON.open("r", encoding="utf-8") as f:
-    rm = json.load(f)
-
 meta = pd.read_parquet(META_PARQUET)
 meta = meta[[ "sha", "pr_id", "number", "repo_url", "full_name", "language", "agent" ]].drop_duplicates()
 
 print(f"Meta rows: {len(meta)} | commits: {meta['sha'].nunique()} | PRs: {meta['pr_id'].nunique()} | repos: {meta['full_name'].nunique()}")
 
-print("Flattening RefactoringMiner refactorings")
-ref_rows: List[Dict[str, Any]] = []
-commits_json: List[Dict[str, Any]] = rm.get("commits", [])
+meta_refs = meta.assign(owner=meta["full_name"].apply(_owner_of), repo=meta["full_name"].apply(_repo_of))
+meta_table = pa.Table.from_pandas(meta_refs[META_COLS], schema=pa.schema([REFACT_SCHEMA.field(c) for c in META_COLS]), preserve_index=False)
+meta_keys = pa.table({"sha": pa.array(meta_refs["sha"], pa.string()), "meta_index": np.arange(len(meta_refs))})
+
+
+def _attach_meta(refs: pa.Table) -> pa.Table:
+    """Left-join commit metadata on sha (one output row per matching metadata row)."""
+    keys = pa.table({"sha": refs["sha"], "ref_index": np.arange(refs.num_rows)})
+    pairs = keys.join(meta_keys, keys="sha", join_type="left outer")
+    pairs = pairs.sort_by([("ref_index", "ascending"), ("meta_index", "ascending")])
+    out = refs.take(pairs["ref_index"])
+    meta_rows = meta_table.take(pairs["meta_index"])
+    for col in META_COLS:
+        out = out.append_column(col, meta_rows[col])
+    return out
+
+
+OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-for c in commits_json:
-    repo_url = c.get("repository")
-    commit_sha = c.get("sha1")
-    commit_url = c.get("url")
-    refactorings = _safe_list(c.get("refactorings"))
+print(f"Flattening RefactoringMiner refactorings from {rm_path.name}")
+ref_writer = ParquetBatchWriter(REFACT_OUT, REFACT_SCHEMA)
+type_pairs = []
 
-    if not commit_sha:
+for batch in iter_commit_batches(rm_path):
+    flat = explode_refactorings(batch)
+    flat = flat.filter(pc.fill_null(pc.not_equal(flat["sha1"], ""), False))
+    if flat.num_rows == 0:
         continue
 
-    for ref in refactorings:
-        ref_type = ref.get("type")
-        desc = ref.get("description", "")
-
-        left_locs = _flatten_locations(ref.get("leftSideLocations", []))
-        right_locs = _flatten_locations(ref.get("rightSideLocations", []))
-        left_elems = [x.get("codeElement") for x in left_locs if x.get("codeElement")]
-        right_elems = [x.get("codeElement") for x in right_locs if x.get("codeElement")]
-
-        ref_rows.append({
-            "sha": commit_sha,
-            "repo_url_rm": repo_url,
-            "repo_full_name_rm": _norm_repo_name_from_url(repo_url),
-            "commit_url": commit_url,
-            "refactoring_type": ref_type,
-            "description": desc,
-            "left_locations": left_locs,
-            "right_locations": right_locs,
-            "left_elements": left_elems,
-            "right_elements": right_elems,
-        })
-
-ref_df = pd.DataFrame(ref_rows)
-
-if len(ref_df) == 0:
+    refs = pa.table({
+        "sha": flat["sha1"],
+        "repo_url_rm": flat["repository"],
+        "repo_full_name_rm": pc.fill_null(map_distinct(flat["repository"], _norm_repo_name_from_url), ""),
+        "commit_url": flat["url"],
+        "refactoring_type": flat["type"],
+        "description": flat["description"],
+        "left_locations": project_locations(flat["leftSideLocations"].combine_chunks()),
+        "right_locations": project_locations(flat["rightSideLocations"].combine_chunks()),
+        "left_elements": element_lists(flat["leftSideLocations"].combine_chunks(), "codeElement"),
+        "right_elements": element_lists(flat["rightSideLocations"].combine_chunks(), "codeElement"),
+    })
+    ref_writer.write(_attach_meta(refs).cast(REFACT_SCHEMA))
+
+    typed = refs.select(["sha", "refactoring_type"]).filter(pc.is_valid(refs["refactoring_type"]))
+    type_pairs.append(typed.group_by(["sha", "refactoring_type"]).aggregate([([], "count_all")]))
+
+ref_writer.close()
+
+pairs = pa.concat_tables(type_pairs) if type_pairs else pa.table({
+    "sha": pa.array([], pa.string()), "refactoring_type": pa.array([], pa.string()), "count_all": pa.array([], pa.int64()),
+})
+pairs = (
+    pairs.group_by(["sha", "refactoring_type"]).aggregate([("count_all", "sum")])
+    .sort_by([("sha", "ascending"), ("refactoring_type", "ascending")])
+)
+type_counts = (
+    pairs.group_by("refactoring_type").aggregate([("count_all_sum", "sum")])
+    .sort_by([("count_all_sum_sum", "descending")])
+)
+total_refactorings = pc.sum(pairs["count_all_sum"]).as_py() or 0
+
+if total_refactorings == 0:
     print("No refactorings found in refminer JSON.")
 else:
-    print(f"Refactorings: {len(ref_df)} across {ref_df['sha'].nunique()} commits and {ref_df['refactoring_type'].nunique()} types.")
+    print(f"Refactorings: {total_refactorings} across {len(pc.unique(pairs['sha']))} commits and {type_counts.num_rows} types.")
+    print(f"Saved: {REFACT_OUT}")
 
 print("Aggregating per-commit metrics...")
-if len(ref_df) > 0:
-    agg = (
-        ref_df.groupby("sha")
-        .agg(
-            refactoring_count=("refactoring_type", "count"),
-            unique_types=("refactoring_type", lambda s: sorted(set(s))),
-        )
-        .reset_index()
-    )
-    agg["has_refactoring"] = True
-else:
-    agg = pd.DataFrame(columns=["sha", "refactoring_count", "unique_types", "has_refactoring"])
+per_commit = pairs.group_by("sha", use_threads=False).aggregate([
+    ("count_all_sum", "sum"),
+    ("refactoring_type", "list"),
+])
+agg = pd.DataFrame({
+    "sha": per_commit["sha"].to_pylist(),
+    "refactoring_count": per_commit["count_all_sum_sum"].to_pylist(),
+    "unique_types": per_commit["refactoring_type_list"].to_pylist(),
+    "has_refactoring": True,
+}, columns=["sha", "refactoring_count", "unique_types", "has_refactoring"])
 
 commits = meta.merge(agg, on="sha", how="left")
 commits["has_refactoring"] = commits["has_refactoring"].fillna(False)
 commits["refactoring_count"] = commits["refactoring_count"].fillna(0).astype(int)
 commits["unique_types"] = commits["unique_types"].apply(lambda v: v if isinstance(v, list) else [])
 
-commits["owner"] = commits["full_name"].apply(lambda s: s.split("/")[0] if isinstance(s, str) and "/" in s else s)
-commits["repo"] = commits["full_name"].apply(lambda s: s.split("/")[1] if isinstance(s, str) and "/" in s else s)
-
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-#Outputs
-if len(ref_df) > 0:
-    ref_enriched = ref_df.merge(
-        commits[["sha", "pr_id", "number", "full_name", "owner", "repo", "agent"]],
-        on="sha", how="left"
-    )
-    ref_enriched.to_parquet(REFACT_OUT, index=False)
-    print(f"Saved: {REFACT_OUT}")
+commits["owner"] = commits["full_name"].apply(_owner_of)
+commits["repo"] = commits["full_name"].apply(_repo_of)
 
 #Deduplicate
 print("\nDeduplicating on commit–agent pairs...")
@@ -157,16 +186,9 @@ print(f"Commits total: {total_commits}")
 print(f"Commits with refactoring: {ref_commits} ({pct:.2f}%)")
 print(f"Avg # refactorings per refactoring-commit: {mean_per_ref_commit:.2f}")
 
-if len(ref_df) > 0:
-    top_types = (
-        ref_df["refactoring_type"]
-        .value_counts()
-        .head(10)
-        .rename_axis("refactoring_type")
-        .reset_index(name="count")
-    )
+if total_refactorings > 0:
     print("\nTop 10 refactoring types:")
-    for _, row in top_types.iterrows():
-        print(f"     - {row['refactoring_type']}: {row['count']}")
+    for ref_type, count in zip(type_counts["refactoring_type"].to_pylist()[:10], type_counts["count_all_sum_sum"].to_pylist()):
+        print(f"     - {ref_type}: {count}")
 else:
     print("No refactoring types present (empty ref_df).")
@@ -1,36 +1,61 @@
-import pandas as pd
+import duckdb
 from pathlib import Path
 
 RAW = Path("data/raw")
 OUT = Path("data/processed/agentic_pr_commits.parquet")
+SPILL_DIR = Path("data/processed/.duckdb_spill")
 
-print("Loading base datasets...")
-repos = pd.read_parquet(RAW / "all_repository.parquet")
-prs = pd.read_parquet(RAW / "pull_request.parquet")
-commits = pd.read_parquet(RAW / "pr_commits.parquet")
-
-print(f"Repositories: {len(repos):,}, PRs: {len(prs):,}, Commits: {len(commits):,}")
+# DuckDB scans the raw Parquet files itself: only the referenced columns are read,
+# the filters run inside the scan, and joins spill to SPILL_DIR instead of holding
+# the whole raw dump in memory.
+MEMORY_LIMIT = "4GB"
 
-# Filter Java repositories
-repos_java = repos[repos["language"].str.lower() == "java"]
-print(f"Java repos: {len(repos_java):,}")
 
-# Join PRs with their repositories
-prs_merged = prs.merge(repos_java, left_on="repo_id", right_on="id", suffixes=("", "_repo"))
-print(f"Java PRs after merge: {len(prs_merged):,}")
+def scan(name: str) -> str:
+    return f"read_parquet('{(RAW / name).as_posix()}')"
 
-# Join commits with PRs
-merged = commits.merge(prs_merged, left_on="pr_id", right_on="id", how="inner")
 
-# Keep only AI-agentic PRs
-merged = merged[merged["agent"].notna() & (merged["agent"].str.strip() != "")]
-print(f"AI-agentic PRs: {len(merged):,}")
+con = duckdb.connect()
+SPILL_DIR.mkdir(parents=True, exist_ok=True)
+con.execute(f"SET memory_limit = '{MEMORY_LIMIT}'")
+con.execute(f"SET temp_directory = '{SPILL_DIR.as_posix()}'")
+con.execute("SET preserve_insertion_order = false")
 
-# Keep essential columns
-final = merged[[
-    "sha", "pr_id", "number", "repo_url", "full_name", "language", "agent"
-]].drop_duplicates()
+print("Loading base datasets...")
+# Row counts come from the Parquet footers; no data pages are read
+n_repos, n_prs, n_commits = (con.execute(f"SELECT count(*) FROM {scan(name)}").fetchone()[0]
+                             for name in ("all_repository.parquet", "pull_request.parquet", "pr_commits.parquet"))
+print(f"Repositories: {n_repos:,}, PRs: {n_prs:,}, Commits: {n_commits:,}")
 
+# Filter Java repositories
+con.execute(f"""
+    CREATE TEMP VIEW repos_java AS
+    SELECT id, full_name, language FROM {scan("all_repository.parquet")}
+    WHERE lower(language) = 'java'
+""")
+print(f"Java repos: {con.execute('SELECT count(*) FROM repos_java').fetchone()[0]:,}")
+
+# Keep only AI-agentic PRs of Java repositories
+con.execute(f"""
+    CREATE TEMP VIEW prs_java AS
+    SELECT p.id, p.number, p.repo_url, p.agent, r.full_name, r.language
+    FROM {scan("pull_request.parquet")} p
+    JOIN repos_java r ON p.repo_id = r.id
+    WHERE p.agent IS NOT NULL AND trim(p.agent) <> ''
+""")
+print(f"AI-agentic Java PRs: {con.execute('SELECT count(*) FROM prs_java').fetchone()[0]:,}")
+
+# Join commits with PRs and keep essential columns
 OUT.parent.mkdir(parents=True, exist_ok=True)
-final.to_parquet(OUT)
-print(final.sample(5))
+con.execute(f"""
+    COPY (
+        SELECT DISTINCT c.sha, c.pr_id, p.number, p.repo_url, p.full_name, p.language, p.agent
+        FROM {scan("pr_commits.parquet")} c
+        JOIN prs_java p ON c.pr_id = p.id
+    ) TO '{OUT.as_posix()}' (FORMAT PARQUET)
+""")
+
+out = f"read_parquet('{OUT.as_posix()}')"
+print(f"AI-agentic PR commits: {con.execute(f'SELECT count(*) FROM {out}').fetchone()[0]:,}")
+print(con.execute(f"SELECT * FROM {out} USING SAMPLE 5").df())
+con.close()
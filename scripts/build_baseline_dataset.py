@@ -1,68 +1,102 @@
-import json
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from pathlib import Path
 
+from refminer_ingest import (
+    ParquetBatchWriter,
+    distinct_sorted_lists,
+    element_lists,
+    explode_refactorings,
+    iter_commit_batches,
+    map_distinct,
+    resolve_rm_output,
+)
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = PROJECT_ROOT / "data" 
 
 PR_COMMITS = DATA_DIR / "baseline_pr_commits.parquet"
-RM_JSON = DATA_DIR / "refminer_baseline_results" / "refminer_all_baseline.json"
+RM_JSON = DATA_DIR / "refminer_baseline_results" / "refminer_all_baseline.jsonl"
 
 COMMITS_OUT = DATA_DIR / "baseline_refactoring_commits.parquet"
 REFACT_OUT = DATA_DIR / "baseline_refactorings.parquet"
 NORMALIZED_OUT = DATA_DIR / "baseline_refactoring_commits_normalized.parquet"
 
+REFACT_SCHEMA = pa.schema([
+    ("agent_type", pa.string()),
+    ("repo_name", pa.string()),
+    ("commit_sha", pa.string()),
+    ("commit_url", pa.string()),
+    ("refactoring_type", pa.string()),
+    ("description", pa.string()),
+    ("entities_before", pa.list_(pa.string())),
+    ("entities_after", pa.list_(pa.string())),
+])
+
 print("📦 Loading inputs...")
 if not PR_COMMITS.exists():
     raise SystemExit(f"Missing PR commits parquet: {PR_COMMITS}")
-if not RM_JSON.exists():
+rm_path = resolve_rm_output(RM_JSON)
+if rm_path is None:
     raise SystemExit(f"Missing RefactoringMiner JSON: {RM_JSON}")
 
 pr_df = pd.read_parquet(PR_COMMITS)
 pr_df["sha"] = pr_df["sha"].astype(str).str.lower().str.strip()
 
 #Process RMiner output
-with RM_JSON.open("r", encoding="utf-8") as f:
-    rm_data = json.load(f)
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+ref_writer = ParquetBatchWriter(REFACT_OUT, REFACT_SCHEMA)
+ref_shas = set()
 
 print("Extracting commit-level and refactoring-level data...")
 rm_commits = []
-ref_rows = []
 
-for c in rm_data.get("commits", []):
-    sha = str(c.get("sha1", "")).strip().lower()
-    if not sha:
+for batch in iter_commit_batches(rm_path):
+    sha = pc.utf8_lower(pc.utf8_trim_whitespace(batch.column("sha1")))
+    keep = pc.fill_null(pc.not_equal(sha, ""), False)
+    batch = batch.set_column(batch.schema.get_field_index("sha1"), "sha1", sha).filter(keep)
+    if batch.num_rows == 0:
         continue
 
-    repo = c.get("repository", "")
-    url = c.get("url", "")
-    refs = c.get("refactorings", []) or []
-    types = sorted({r.get("type") for r in refs if r.get("type")})
-
-    rm_commits.append({
-        "sha": sha,
-        "refactoring_count": len(refs),
-        "unique_types": types,
-        "has_refactoring": len(refs) > 0,
-    })
-
-    for ref in refs:
-        ref_rows.append({
-            "agent_type": "baseline",
-            "repo_name": repo.split("/")[-1].replace(".git", ""),
-            "commit_sha": sha,
-            "commit_url": url,
-            "refactoring_type": ref.get("type", ""),
-            "description": ref.get("description", ""),
-            "entities_before": [e.get("name") for e in ref.get("leftSideLocations", [])],
-            "entities_after": [e.get("name") for e in ref.get("rightSideLocations", [])],
-        })
-
-rm_df = pd.DataFrame(rm_commits).drop_duplicates(subset=["sha"])
-ref_df = pd.DataFrame(ref_rows)
+    refs = batch.column("refactorings")
+    counts = pc.fill_null(pc.list_value_length(refs), 0)
+    flat = explode_refactorings(batch)
+    rm_commits.append(pa.table({
+        "sha": batch.column("sha1"),
+        "refactoring_count": counts,
+        "unique_types": distinct_sorted_lists(
+            flat["commit_index"], flat["type"], batch.num_rows, keep=lambda v: pc.not_equal(v, "")
+        ),
+        "has_refactoring": pc.greater(counts, 0),
+    }))
+
+    ref_writer.write(pa.table({
+        "agent_type": pa.repeat("baseline", flat.num_rows),
+        "repo_name": map_distinct(
+            pc.fill_null(flat["repository"], ""), lambda repo: repo.split("/")[-1].replace(".git", "")
+        ),
+        "commit_sha": flat["sha1"],
+        "commit_url": flat["url"],
+        "refactoring_type": flat["type"],
+        "description": flat["description"],
+        "entities_before": element_lists(flat["leftSideLocations"].combine_chunks(), "name", drop_missing=False),
+        "entities_after": element_lists(flat["rightSideLocations"].combine_chunks(), "name", drop_missing=False),
+    }).cast(REFACT_SCHEMA))
+    ref_shas.update(pc.unique(flat["sha1"]).to_pylist())
+
+ref_writer.close(write_empty=True)
+
+rm_columns = ["sha", "refactoring_count", "unique_types", "has_refactoring"]
+if rm_commits:
+    rm_table = pa.concat_tables(rm_commits)
+    rm_df = pd.DataFrame({col: rm_table[col].to_pylist() for col in rm_columns}, columns=rm_columns)
+else:
+    rm_df = pd.DataFrame(columns=rm_columns)
+rm_df = rm_df.drop_duplicates(subset=["sha"])
 
 print(f"Parsed {len(rm_df)} commits ({rm_df['has_refactoring'].sum()} with ≥1 refactoring)")
-print(f"Extracted {len(ref_df)} total refactoring events")
+print(f"Extracted {ref_writer.rows} total refactoring events")
 
 print("Merging with baseline PR commits...")
 merged = pr_df.merge(rm_df, on="sha", how="inner")
@@ -84,9 +118,7 @@ merged["unique_types"] = merged["unique_types"].apply(lambda v: v if isinstance(
 merged = merged.drop_duplicates(subset=["sha", "pr_id", "agent"])
 
 print("\nWriting outputs...")
-DATA_DIR.mkdir(parents=True, exist_ok=True)
 merged.to_parquet(COMMITS_OUT, index=False)
-ref_df.to_parquet(REFACT_OUT, index=False)
 
 print(f"  • Commits table → {COMMITS_OUT.name}")
 print(f"  • Refactorings table → {REFACT_OUT.name}")
@@ -151,5 +183,5 @@ print(f"Refactoring rate: {(updated_df['has_refactoring'].mean() * 100):.2f}%")
 print(f"Total analyzed commits: {len(merged):,}")
 print(f"Total normalized commits: {len(updated_df):,}")
 print(f"Commits with ≥1 refactoring: {int(updated_df['has_refactoring'].sum()):,}")
-print(f"Total refactoring events: {len(ref_df):,}")
-print(f"Unique commits with refactorings: {ref_df['commit_sha'].nunique():,}")
+print(f"Total refactoring events: {ref_writer.rows:,}")
+print(f"Unique commits with refactorings: {len(ref_shas):,}")
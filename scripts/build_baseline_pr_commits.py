@@ -1,64 +1,181 @@
-import requests
+import argparse
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from tqdm import tqdm
 import os
 
+from github_client import GitHubClient, GitHubError
+from http_cache import HttpCache
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 REPOS_DIR = PROJECT_ROOT / "repos_baseline"
 CSV_PATH = PROJECT_ROOT / "data" / "java_baseline_repos.csv"
 OUTPUT_PATH = PROJECT_ROOT / "data" / "baseline_pr_commits.parquet"
+PARTS_DIR = PROJECT_ROOT / "data" / "baseline_pr_commits_parts"
+HTTP_CACHE_DIR = PROJECT_ROOT / "data" / "http_cache"
+
+COLUMNS = ["sha", "pr_id", "number", "repo_url", "full_name", "language", "agent"]
+
+# Closed PRs (REST state=closed covers both) with the first page of their commits.
+PR_QUERY = """
+query($owner: String!, $name: String!, $first: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: [CLOSED, MERGED], first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId
+        number
+        commits(first: 100) {
+          totalCount
+          pageInfo { hasNextPage endCursor }
+          nodes { commit { oid } }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Further pages of one PR's commits, for PRs with more than 100.
+PR_COMMITS_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      commits(first: 100, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { commit { oid } }
+      }
+    }
+  }
+}
+"""
+REST_COMMITS_CAP = 250  # the REST commits listing of a PR never returns more
+
+parser = argparse.ArgumentParser(description="Collect the commits of every closed PR of the baseline repositories.")
+parser.add_argument("--mode", choices=["graphql", "rest"], default="graphql",
+                    help="graphql: PRs and their commits in batched pages; rest: paginated REST listings.")
+parser.add_argument("--prs-per-page", type=int, default=50, help="PRs per GraphQL page.")
+parser.add_argument("--workers", type=int, default=4, help="Repositories harvested concurrently.")
+parser.add_argument("--flush-every", type=int, default=10,
+                    help=f"Rewrite {OUTPUT_PATH.name} after this many finished repositories.")
+parser.add_argument("--refresh", action="store_true", help="Harvest repositories again even if already done.")
+args = parser.parse_args()
 
 # Load repo list
 repos_df = pd.read_csv(CSV_PATH)
 print(f"Loaded {len(repos_df)} baseline repositories.")
 
-# Get GitHub token for higher rate limit
-token = os.getenv("GITHUB_TOKEN")
-if not token:
+# Get GitHub token for higher rate limit; GITHUB_OFFLINE=1 replays cached responses instead
+http_cache = HttpCache(HTTP_CACHE_DIR)
+client = GitHubClient.from_env(cache=http_cache, max_concurrency=max(8, args.workers))
+if not os.getenv("GITHUB_TOKEN") and not client.offline:
     raise EnvironmentError("Please set your GitHub token in GITHUB_TOKEN.")
+if client.offline and args.mode == "graphql":
+    print("Offline: GraphQL is not cached, harvesting from cached REST listings instead.")
+    args.mode = "rest"
 
-headers = {"Authorization": f"token {token}"}
-
-rows = []
 
 def get_pr_commits(full_name, pr_number):
-    """Return list of commits for a given PR"""
-    commits_url = f"https://api.github.com/repos/{full_name}/pulls/{pr_number}/commits"
-    resp = requests.get(commits_url, headers=headers)
-    if resp.status_code != 200:
-        return []
-    return [c["sha"] for c in resp.json()]
-
-
-for _, row in tqdm(repos_df.iterrows(), total=len(repos_df), desc="Extracting PR commits"):
-    repo_url = row["repo_url"]
-    full_name = repo_url.replace("https://github.com/", "").replace(".git", "")
-
-    #List PRs for this repo
-    prs_url = f"https://api.github.com/repos/{full_name}/pulls?state=closed&per_page=100"
-    resp = requests.get(prs_url, headers=headers)
-    if resp.status_code != 200:
-        print(f"Failed to fetch PRs for {full_name}")
-        continue
-
-    for pr in resp.json():
-        pr_id = pr["id"]
-        number = pr["number"]
-
-        for sha in get_pr_commits(full_name, number):
-            rows.append({
-                "sha": sha,
-                "pr_id": pr_id,
-                "number": number,
-                "repo_url": repo_url,
-                "full_name": full_name,
-                "language": "Java",
-                "agent": "Human"
-            })
+    """Return the commit SHAs of a PR (at most REST_COMMITS_CAP); [] if the PR is gone."""
+    shas = [c["sha"] for c in client.paginate(f"repos/{full_name}/pulls/{pr_number}/commits",
+                                              params={"per_page": 100}, missing_ok=True)]
+    if len(shas) >= REST_COMMITS_CAP:
+        print(f"⚠️ {full_name}#{pr_number}: REST lists only the first {REST_COMMITS_CAP} commits; "
+              "use --mode graphql for all of them.")
+    return shas
+
+
+def get_pr_commits_graphql(owner, name, number, commits):
+    """All commit SHAs of a PR, continuing from the first page `commits` of PR_QUERY."""
+    shas = [c["commit"]["oid"] for c in commits["nodes"]]
+    page = commits["pageInfo"]
+    while page["hasNextPage"]:
+        data = client.graphql(PR_COMMITS_QUERY, {"owner": owner, "name": name, "number": number,
+                                                 "after": page["endCursor"]})
+        pr = (data.get("repository") or {}).get("pullRequest")
+        if pr is None:
+            break
+        shas += [c["commit"]["oid"] for c in pr["commits"]["nodes"]]
+        page = pr["commits"]["pageInfo"]
+    if len(shas) < commits["totalCount"]:
+        print(f"⚠️ {owner}/{name}#{number}: got {len(shas)} of {commits['totalCount']} commits.")
+    return shas
+
+
+def harvest_rest(full_name):
+    """(pr_id, number, shas) for every closed PR, following the PR listing to its last page."""
+    prs = list(client.paginate(f"repos/{full_name}/pulls", params={"state": "closed", "per_page": 100}))
+    return [(pr["id"], pr["number"], get_pr_commits(full_name, pr["number"])) for pr in prs]
+
+
+def harvest_graphql(full_name):
+    """Same as harvest_rest, but `--prs-per-page` PRs and their commits per request."""
+    owner, name = full_name.split("/", 1)
+    prs, after = [], None
+    while True:
+        data = client.graphql(PR_QUERY, {"owner": owner, "name": name, "first": args.prs_per_page, "after": after})
+        if data.get("repository") is None:
+            raise GitHubError(f"{full_name} not found")
+        page = data["repository"]["pullRequests"]
+        for node in page["nodes"]:
+            shas = get_pr_commits_graphql(owner, name, node["number"], node["commits"])
+            prs.append((node["databaseId"], node["number"], shas))
+        if not page["pageInfo"]["hasNextPage"]:
+            return prs
+        after = page["pageInfo"]["endCursor"]
+
+
+def part_path(full_name):
+    return PARTS_DIR / f"{full_name.replace('/', '__')}.parquet"
+
+
+def harvest_repo(repo_url, full_name):
+    """Harvest one repository into its part file; returns the number of commits."""
+    prs = harvest_graphql(full_name) if args.mode == "graphql" else harvest_rest(full_name)
+    rows = [{"sha": sha, "pr_id": pr_id, "number": number, "repo_url": repo_url, "full_name": full_name,
+             "language": "Java", "agent": "Human"}
+            for pr_id, number, shas in prs for sha in shas]
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    tmp = part_path(full_name).with_suffix(".tmp")
+    df.to_parquet(tmp, index=False)
+    tmp.replace(part_path(full_name))
+    return len(df)
+
+
+def write_output():
+    """Combine the finished part files into OUTPUT_PATH (atomically, so readers never see half a file)."""
+    parts = [pd.read_parquet(p) for p in sorted(PARTS_DIR.glob("*.parquet"))]
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=COLUMNS)
+    tmp = OUTPUT_PATH.with_suffix(".tmp")
+    df.to_parquet(tmp, index=False)
+    tmp.replace(OUTPUT_PATH)
+    return df
+
+
+PARTS_DIR.mkdir(parents=True, exist_ok=True)
+repos = [(row["repo_url"], row["repo_url"].replace("https://github.com/", "").replace(".git", ""))
+         for _, row in repos_df.iterrows()]
+todo = [(url, name) for url, name in repos if args.refresh or not part_path(name).exists()]
+print(f"{len(repos) - len(todo)} repositories already harvested, {len(todo)} to go ({args.mode}).")
+
+failed = []
+with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+    futures = {pool.submit(harvest_repo, url, name): name for url, name in todo}
+    for done, fut in enumerate(tqdm(as_completed(futures), total=len(futures), desc="Extracting PR commits"), 1):
+        try:
+            fut.result()
+        except (GitHubError, OSError, ValueError, KeyError) as e:
+            print(f"Failed to fetch PRs for {futures[fut]}: {e}")
+            failed.append(futures[fut])
+        if done % args.flush_every == 0:
+            write_output()
+
+print(http_cache.summary())
 
 #Output
-df = pd.DataFrame(rows)
+df = write_output()
 print(f"Extracted {len(df)} PR commits from {df['full_name'].nunique()} repos.")
-df.to_parquet(OUTPUT_PATH, index=False)
+if failed:
+    print(f"{len(failed)} repositories failed and will be retried on the next run.")
 print(f"Saved to {OUTPUT_PATH}")
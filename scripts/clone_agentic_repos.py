@@ -1,27 +1,40 @@
+import argparse
 import os
-import time
-import subprocess
-import requests
 import pandas as pd
 from pathlib import Path
 from tqdm import tqdm
 
+from github_client import GitHubClient, GitHubError
+from http_cache import HttpCache
+from repo_mirror import CloneJob, ObjectStores, clone_all
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_RAW = PROJECT_ROOT / "data" / "raw"
 DATA_PROCESSED = PROJECT_ROOT / "data"
 CLONE_DIR = PROJECT_ROOT / "repos_forks"
+STORES_DIR = PROJECT_ROOT / "repos_objects"
+HTTP_CACHE_DIR = PROJECT_ROOT / "data" / "http_cache"
 
 for d in [DATA_PROCESSED, CLONE_DIR]:
     d.mkdir(parents=True, exist_ok=True)
 
 PULL_REQUESTS = DATA_RAW / "pull_request.parquet"
 JAVA_COMMITS = DATA_PROCESSED / "agentic_pr_commits.parquet"
+FORK_MAP = DATA_PROCESSED / "pr_fork_map_java.parquet"
 
-TOKEN = os.getenv("GITHUB_TOKEN")
-if not TOKEN:
-    raise EnvironmentError("Please set GITHUB_TOKEN in your environment.")
+parser = argparse.ArgumentParser(description="Clone the fork repositories of agentic Java PRs.")
+parser.add_argument("--workers", type=int, default=4, help="Number of concurrent clones.")
+parser.add_argument("--refresh-forks", action="store_true",
+                    help=f"Resolve every PR's fork again instead of reusing {FORK_MAP.name}.")
+parser.add_argument("--no-shared-store", action="store_true",
+                    help=f"Clone every fork in full instead of borrowing objects from {STORES_DIR.name}/.")
+args = parser.parse_args()
 
-HEADERS = {"Authorization": f"token {TOKEN}"}
+# GITHUB_OFFLINE=1 answers GitHub API calls from the HTTP cache only (no token or network needed)
+http_cache = HttpCache(HTTP_CACHE_DIR)
+client = GitHubClient.from_env(cache=http_cache)
+if not os.getenv("GITHUB_TOKEN") and not client.offline:
+    raise EnvironmentError("Please set GITHUB_TOKEN in your environment.")
 
 print("Loading PR and commit data...")
 pulls = pd.read_parquet(PULL_REQUESTS)
@@ -32,51 +45,89 @@ pulls = pulls[pulls["id"].isin(java_pr_ids)]
 print(f"Found {len(pulls)} matching Java PRs across {pulls['repo_url'].nunique()} repos.")
 
 #Fork data
-def fetch_fork_info(repo_url: str, pr_number: int):
-    """Return the fork repo URL for a given PR via GitHub API."""
+def repo_full_name(repo_url: str) -> str:
     if "api.github.com/repos/" in repo_url:
-        repo_path = repo_url.split("api.github.com/repos/")[-1].rstrip("/")
-    else:
-        repo_path = repo_url.replace("https://github.com/", "").rstrip(".git").rstrip("/")
+        return repo_url.split("api.github.com/repos/")[-1].rstrip("/")
+    return repo_url.replace("https://github.com/", "").rstrip(".git").rstrip("/")
+
 
-    url = f"https://api.github.com/repos/{repo_path}/pulls/{pr_number}"
+NO_FORK = ""  # the API answered, but the PR's head repository is gone
+
+
+def fetch_fork_info(repo_url: str, pr_number: int):
+    """Return the fork repo URL for a given PR via GitHub API (NO_FORK if deleted, None if the call failed)."""
+    repo_path = repo_full_name(repo_url)
 
     try:
-        r = requests.get(url, headers=HEADERS)
-        if r.status_code == 403:
-            print("Rate limited, sleeping 60s...")
-            time.sleep(60)
-            return None
-        r.raise_for_status()
-        data = r.json()
-        head_repo = data.get("head", {}).get("repo", {})
-        return head_repo.get("clone_url")
-    except Exception as e:
+        data = client.get_json(f"repos/{repo_path}/pulls/{pr_number}")
+    except (GitHubError, ValueError, OSError) as e:
         print(f"{repo_url}#{pr_number} failed: {e}")
         return None
+    if data is None:
+        return NO_FORK
+    head_repo = (data.get("head") or {}).get("repo") or {}  # repo is null for deleted forks
+    return head_repo.get("clone_url") or NO_FORK
+
 
-#Fetch
+def load_fork_map() -> pd.DataFrame:
+    if FORK_MAP.exists():
+        return pd.read_parquet(FORK_MAP)
+    return pd.DataFrame({"pr_id": pd.Series(dtype="int64"), "pr_number": pd.Series(dtype="int64"),
+                         "base_repo": pd.Series(dtype="str"), "fork_repo": pd.Series(dtype="str")})
+
+
+def save_fork_map(fork_map: pd.DataFrame):
+    fork_map = fork_map.drop_duplicates("pr_id", keep="last").sort_values("pr_id")
+    tmp = FORK_MAP.with_suffix(".tmp")
+    fork_map.to_parquet(tmp, index=False)
+    tmp.replace(FORK_MAP)
+
+
+#Fetch only the PRs the fork map does not know yet
+fork_map = load_fork_map()
+known = set() if args.refresh_forks else set(zip(fork_map["base_repo"], fork_map["pr_number"]))
+prs = pulls[["id", "repo_url", "number"]].astype({"number": int})
+missing = prs[[(url, n) not in known for url, n in zip(prs["repo_url"], prs["number"])]]
+print(f"{len(prs) - len(missing)} PRs already in {FORK_MAP.name}, resolving {len(missing)}.")
+
+if len(missing):
+    fork_urls = client.map(lambda pr: fetch_fork_info(*pr), list(zip(missing["repo_url"], missing["number"])),
+                           desc="Fetching forks")
+    print(http_cache.summary())
+    resolved = missing.assign(fork_repo=fork_urls)
+    resolved = resolved[resolved["fork_repo"].notna()]  # failed calls are retried on the next run
+    new_rows = pd.DataFrame({"pr_id": resolved["id"].astype("int64"), "pr_number": resolved["number"].astype("int64"),
+                             "base_repo": resolved["repo_url"],
+                             "fork_repo": resolved["fork_repo"].replace(NO_FORK, None)})
+    fork_map = pd.concat([fork_map, new_rows], ignore_index=True) if len(fork_map) else new_rows
+    save_fork_map(fork_map)
+    print(f"Added {len(new_rows)} PRs to {FORK_MAP.name}.")
+
+fork_of = {(url, n): fork for url, n, fork in zip(fork_map["base_repo"], fork_map["pr_number"], fork_map["fork_repo"])}
 results = []
-for _, row in tqdm(pulls.iterrows(), total=len(pulls), desc="Fetching forks"):
-    fork_url = fetch_fork_info(row["repo_url"], int(row["number"]))
-    if not fork_url:
+for repo_url, number in zip(prs["repo_url"], prs["number"]):
+    fork_url = fork_of.get((repo_url, number))
+    if not isinstance(fork_url, str) or not fork_url:
         continue
-    results.append(fork_url)
+    # The PR's base repository is the upstream network the fork shares objects with.
+    results.append((fork_url, f"https://github.com/{repo_full_name(repo_url)}.git"))
 
 # Deduplicate forks
-forks = sorted(set(results))
+upstream_of = dict(sorted(results, reverse=True))
+forks = sorted(upstream_of)
 print(f"Found {len(forks)} unique fork repos to clone.")
 
 #Clone
-for url in tqdm(forks, desc="Cloning forks"):
+jobs = []
+for url in forks:
     name = url.rstrip("/").split("/")[-1].replace(".git", "")
-    dest = CLONE_DIR / name
-    if dest.exists():
-        print(f"Skipping existing repo: {name}")
-        continue
-    try:
-        subprocess.run(["git", "clone", url, str(dest)], check=True)
-    except subprocess.CalledProcessError:
-        print(f"Failed to clone {url}")
+    jobs.append(CloneJob(url, CLONE_DIR / name, upstream_of[url]))
+
+stores = None if args.no_shared_store else ObjectStores(STORES_DIR)
+outcome = clone_all(jobs, stores, workers=args.workers)
+print(f"Cloned {len(outcome['cloned'])}, skipped {len(outcome['skipped'])} existing, "
+      f"failed {len(outcome['failed'])}.")
+for job in outcome["failed"]:
+    print(f"Failed to clone {job.url}")
 
-print("All fork repositories cloned successfully.")
+print("All fork repositories cloned successfully." if not outcome["failed"] else "Fork cloning finished with failures.")
@@ -1,22 +1,26 @@
-import subprocess
+import argparse
 import pandas as pd
 from pathlib import Path
-from tqdm import tqdm
+
+from repo_mirror import CloneJob, clone_all
 
 REPO_LIST = Path("data/processed/java_baseline_repos.csv")
 OUT_DIR = Path("repos_baseline")
 OUT_DIR.mkdir(exist_ok=True)
 
+parser = argparse.ArgumentParser(description="Shallow-clone the baseline Java repositories.")
+parser.add_argument("--workers", type=int, default=4, help="Number of concurrent clones.")
+args = parser.parse_args()
+
 df = pd.read_csv(REPO_LIST)
 
-for _, row in tqdm(df.iterrows(), total=len(df), desc="Cloning repos"):
-    url, name = row["repo_url"], row["name"]
-    dest = OUT_DIR / name
-    if dest.exists():
-        print(f"⏭️  Skipping existing repo: {name}")
-        continue
-    try:
-        subprocess.run(["git", "clone", "--quiet", "--depth", "1", url, str(dest)], check=True)
-        print(f"✅ Cloned {name}")
-    except subprocess.CalledProcessError:
-        print(f"❌ Failed to clone {name} ({url})")
+# Baselines are unrelated repos cloned with --depth 1, so there is no network to share objects with.
+jobs = [CloneJob(row["repo_url"], OUT_DIR / row["name"]) for _, row in df.iterrows()]
+outcome = clone_all(jobs, workers=args.workers, extra_args=["--depth", "1"])
+
+for job in outcome["skipped"]:
+    print(f"⏭️  Skipping existing repo: {job.dest.name}")
+for job in outcome["cloned"]:
+    print(f"✅ Cloned {job.dest.name}")
+for job in outcome["failed"]:
+    print(f"❌ Failed to clone {job.dest.name} ({job.url})")
@@ -0,0 +1,75 @@
+import argparse
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from tqdm import tqdm
+
+from repo_mirror import fetch_commits, init_partial_repo, missing_objects, prefetch_blobs
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = PROJECT_ROOT / "data"
+
+DATASETS = {
+    "agentic": (DATA_DIR / "agentic_pr_commits.parquet", PROJECT_ROOT / "repos_forks"),
+    "baseline": (DATA_DIR / "baseline_pr_commits.parquet", PROJECT_ROOT / "repos_baseline"),
+}
+
+parser = argparse.ArgumentParser(
+    description="Fetch only the analyzed commits and their parents into each repository (instead of full clones).")
+parser.add_argument("--dataset", choices=[*DATASETS, "both"], default="both")
+parser.add_argument("--workers", type=int, default=4, help="Number of repositories fetched concurrently.")
+parser.add_argument("--depth", type=int, default=2, help="History fetched per commit (2 = the commit and its parents).")
+parser.add_argument("--full-blobs", action="store_true",
+                    help="Fetch all file contents instead of a blobless fetch plus the changed .java blobs.")
+parser.add_argument("--dry-run", action="store_true", help="Only print the fetch plan.")
+args = parser.parse_args()
+
+
+def plan(commits_path: Path, repos_dir: Path) -> list[tuple[str, Path, list[str]]]:
+    """(full_name, repo dir, SHAs whose commit or first parent is not local) per repository."""
+    df = pd.read_parquet(commits_path, columns=["full_name", "sha"]).drop_duplicates()
+    todo = []
+    for full_name, group in df.groupby("full_name"):
+        repo = repos_dir / full_name.split("/")[-1]
+        shas = sorted(group["sha"])
+        if repo.exists():
+            missing = set(missing_objects(repo, [*shas, *(f"{s}^1" for s in shas)]))
+            shas = [s for s in shas if s in missing or f"{s}^1" in missing]
+        if shas:
+            todo.append((full_name, repo, shas))
+    return todo
+
+
+def fetch_repo(full_name: str, repo: Path, shas: list[str]) -> tuple[int, int]:
+    """Fetch `shas` into `repo`, creating it as an empty partial repo if needed; (fetched, still missing)."""
+    blobless = not args.full_blobs
+    if not repo.exists() and not init_partial_repo(repo, f"https://github.com/{full_name}.git", blobless):
+        return 0, len(shas)
+    still_missing = fetch_commits(repo, shas, depth=args.depth, blobless=blobless)
+    present = [s for s in shas if s not in still_missing]
+    if blobless and present:
+        prefetch_blobs(repo, present)
+    return len(present), len(still_missing)
+
+
+for name in (DATASETS if args.dataset == "both" else [args.dataset]):
+    commits_path, repos_dir = DATASETS[name]
+    if not commits_path.exists():
+        print(f"⏭️  {commits_path.name} not found, skipping {name}.")
+        continue
+    repos_dir.mkdir(parents=True, exist_ok=True)
+    todo = plan(commits_path, repos_dir)
+    print(f"{name}: {sum(len(s) for _, _, s in todo)} commits to fetch across {len(todo)} repositories.")
+    if args.dry_run or not todo:
+        continue
+
+    fetched = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(fetch_repo, *job): job for job in todo}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc=f"Fetching {name} commits"):
+            ok, missing = fut.result()
+            fetched += ok
+            failed += missing
+            if missing:
+                print(f"❌ {futures[fut][0]}: {missing} commits could not be fetched")
+    print(f"✅ {name}: fetched {fetched} commits, {failed} unavailable.")
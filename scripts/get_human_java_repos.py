@@ -1,82 +1,179 @@
 import os
 import csv
 import random
-import requests
+import argparse
+import threading
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
 from tqdm import tqdm
 from pathlib import Path
 
+from github_client import GitHubClient, GitHubError
+from http_cache import HttpCache
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 OUTPUT_CSV = PROJECT_ROOT / "data" / "java_baseline_repos.csv"
+POOL_CSV = PROJECT_ROOT / "data" / "java_repo_pool.csv"
+HTTP_CACHE_DIR = PROJECT_ROOT / "data" / "http_cache"
 
 MIN_STARS = 50
-MAX_REPOS = 100
 SELECTED_REPOS = 86
 PUSHED_BEFORE = "2021-01-01"
+PUSHED_AFTER = "2008-01-01"  # GitHub's launch; no repository was pushed earlier
+SEARCH_CAP = 1000  # the search API never returns more results than this for one query
+PER_PAGE = 100
+POOL_FIELDS = ["id", "repo_url", "name", "size_gb", "stars", "pushed_at"]
 
-TOKEN = os.getenv("GITHUB_TOKEN")
-if not TOKEN:
+# GITHUB_OFFLINE=1 replays the cached search pages instead of querying GitHub
+http_cache = HttpCache(HTTP_CACHE_DIR)
+client = GitHubClient.from_env(cache=http_cache)
+if not os.getenv("GITHUB_TOKEN") and not client.offline:
     raise EnvironmentError("Please set GITHUB_TOKEN in your environment.")
 
-HEADERS = {"Accept": "application/vnd.github+json"}
-if TOKEN:
-    HEADERS["Authorization"] = f"token {TOKEN}"
-
-#Query GitHUb
-def get_human_written_java_repos(min_stars=50, pushed_before="2021-01-01", max_repos=500, max_pages=20):
-    """Fetch Java repositories last pushed before a given date (likely human-written)."""
-    repos = []
-    per_page = 100
-    for page in range(1, max_pages + 1):
-        url = (
-            f"https://api.github.com/search/repositories?"
-            f"q=language:Java+stars:>={min_stars}+pushed:<{pushed_before}"
-            f"&sort=stars&order=desc&per_page={per_page}&page={page}"
-        )
-        r = requests.get(url, headers=HEADERS)
-        r.raise_for_status()
-
-        items = r.json().get("items", [])
-        if not items:
-            break
-
-        for item in items:
-            repo_url = item["html_url"] + ".git"
-            name = item["name"]
-            size_gb = item["size"] / 1_000_000
-            repos.append({
-                "repo_url": repo_url,
-                "name": name,
-                "size_gb": round(size_gb, 9)
-            })
-
-            if len(repos) >= max_repos:
-                return repos
-    return repos
+
+class Slice(NamedTuple):
+    """One search query: stars in [min_stars, max_stars] (None = unbounded) and pushed in [pushed_from, pushed_to]."""
+    min_stars: int
+    max_stars: Optional[int]
+    pushed_from: date
+    pushed_to: date
+
+    def query(self) -> str:
+        stars = f">={self.min_stars}" if self.max_stars is None else f"{self.min_stars}..{self.max_stars}"
+        return f"language:Java stars:{stars} pushed:{self.pushed_from.isoformat()}..{self.pushed_to.isoformat()}"
+
+    def split(self, top_stars: int) -> list:
+        """Halve the star range if it spans more than one value, else the push window; [] if neither can shrink."""
+        max_stars = top_stars if self.max_stars is None else self.max_stars
+        if max_stars > self.min_stars:
+            mid = (self.min_stars + max_stars) // 2
+            return [self._replace(max_stars=mid), self._replace(min_stars=mid + 1, max_stars=max_stars)]
+        if self.pushed_to > self.pushed_from:
+            mid = self.pushed_from + (self.pushed_to - self.pushed_from) // 2
+            return [self._replace(pushed_to=mid), self._replace(pushed_from=mid + timedelta(days=1))]
+        return []
+
+
+class RepoPool:
+    """Deduplicated candidate repositories, appended to POOL_CSV as search pages arrive."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.ids = set()
+        if path.exists():
+            with open(path, newline="", encoding="utf-8") as f:
+                self.ids = {int(row["id"]) for row in csv.DictReader(f)}
+
+    def add(self, items) -> int:
+        rows = [{
+            "id": item["id"],
+            "repo_url": item["html_url"] + ".git",
+            "name": item["name"],
+            "size_gb": round(item["size"] / 1_000_000, 9),
+            "stars": item["stargazers_count"],
+            "pushed_at": item["pushed_at"],
+        } for item in items]
+        with self._lock:
+            rows = [r for r in rows if r["id"] not in self.ids]
+            self.ids.update(r["id"] for r in rows)
+            new_file = not self.path.exists()
+            with open(self.path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=POOL_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+        return len(rows)
+
+    def rows(self):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return sorted(csv.DictReader(f), key=lambda row: int(row["id"]))
+
+
+#Query GitHub
+def search(s: Slice, page: int = 1, per_page: int = PER_PAGE) -> dict:
+    params = {"q": s.query(), "sort": "stars", "order": "desc", "per_page": per_page, "page": page}
+    r = client.get("search/repositories", params=params)
+    if r.headers.get("X-Cache") == "offline-miss":
+        raise GitHubError(f"search page {page} of '{s.query()}' (per_page={per_page}) is not in the HTTP cache")
+    r.raise_for_status()
+    return r.json()
+
+
+def partition(root: Slice) -> list:
+    """Split `root` until every slice has at most SEARCH_CAP results; returns (slice, total_count) leaves."""
+    leaves, level = [], [root]
+    while level:
+        # per_page=1 sorted by stars: the total count plus the top star count, which bounds open ranges
+        heads = client.map(lambda s: search(s, per_page=1), level, desc=f"Sizing {len(level)} slices")
+        next_level = []
+        for s, head in zip(level, heads):
+            total = head.get("total_count", 0)
+            if total <= SEARCH_CAP:
+                if total:
+                    leaves.append((s, total))
+                continue
+            top_stars = head["items"][0]["stargazers_count"] if head.get("items") else s.min_stars
+            parts = s.split(top_stars)
+            if parts:
+                next_level.extend(parts)
+            else:
+                print(f"⚠️ {s.query()} still has {total} results; only the first {SEARCH_CAP} are reachable.")
+                leaves.append((s, SEARCH_CAP))
+        level = next_level
+    return leaves
+
+
+def crawl_human_written_java_repos(pool: RepoPool, min_stars=50, pushed_before="2021-01-01"):
+    """Collect every Java repository with >= min_stars last pushed before a given date (likely human-written)."""
+    root = Slice(min_stars, None, date.fromisoformat(PUSHED_AFTER),
+                 date.fromisoformat(pushed_before) - timedelta(days=1))
+    leaves = partition(root)
+    pages = [(s, page) for s, total in leaves for page in range(1, -(-min(total, SEARCH_CAP) // PER_PAGE) + 1)]
+    print(f"{len(leaves)} slices, {sum(t for _, t in leaves)} results in {len(pages)} pages.")
+    added = client.map(lambda sp: pool.add(search(*sp).get("items", [])), pages, desc="Fetching slices")
+    return sum(added)
+
 
 def save_to_csv(repos, output_path):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     with open(output_path, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=["repo_url", "name", "size_gb"])
+        writer = csv.DictWriter(csvfile, fieldnames=["repo_url", "name", "size_gb"], extrasaction="ignore")
         writer.writeheader()
         writer.writerows(repos)
     print(f"Saved → {output_path}")
 
 def main():
-    print("Fetching Java repositories from GitHub...")
-    repos = get_human_written_java_repos(
-        min_stars=MIN_STARS,
-        pushed_before=PUSHED_BEFORE,
-        max_repos=MAX_REPOS
-    )
+    parser = argparse.ArgumentParser(description="Sample human-written Java repositories from GitHub search.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the sample drawn from the pool.")
+    parser.add_argument("--sample-only", action="store_true",
+                        help=f"Draw the sample from the existing {POOL_CSV.name} without searching.")
+    args = parser.parse_args()
+
+    if args.sample_only and not POOL_CSV.exists():
+        raise SystemExit(f"❌ {POOL_CSV} not found; run without --sample-only first to build the pool.")
+
+    pool = RepoPool(POOL_CSV)
+    if not args.sample_only:
+        print("Fetching Java repositories from GitHub...")
+        try:
+            added = crawl_human_written_java_repos(pool, min_stars=MIN_STARS, pushed_before=PUSHED_BEFORE)
+        except GitHubError as e:
+            if not client.offline:
+                raise
+            raise SystemExit(f"❌ Offline cache miss: {e}. Run once without GITHUB_OFFLINE to fill the cache.")
+        print(http_cache.summary())
+        print(f"Added {added} new repositories to {POOL_CSV.name}.")
 
-    print(f"Retrieved {len(repos)} repositories.")
-    print(f"Randomly selecting {SELECTED_REPOS} of them...")
+    repos = pool.rows()
+    print(f"Pool holds {len(repos)} repositories.")
+    print(f"Randomly selecting {SELECTED_REPOS} of them (seed {args.seed})...")
 
-    random.shuffle(repos)
-    selected = repos[:SELECTED_REPOS]
+    # Sorted by id, so the same pool and seed always give the same sample
+    selected = random.Random(args.seed).sample(repos, min(SELECTED_REPOS, len(repos)))
 
     save_to_csv(selected, OUTPUT_CSV)
-    print(f"🏁 Done. {SELECTED_REPOS} random repos saved to {OUTPUT_CSV.name}")
+    print(f"🏁 Done. {len(selected)} random repos saved to {OUTPUT_CSV.name}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,250 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+from http_cache import HttpCache, auth_scope
+
+API_ROOT = "https://api.github.com"
+RETRY_STATUSES = {500, 502, 503, 504}
+MISSING_STATUSES = {404, 410, 422}  # missing or inaccessible resource
+
+
+class GitHubError(Exception):
+    """A GitHub API call still failed after all retries."""
+
+
+def _resource_of(url: str) -> str:
+    """Rate-limit bucket a URL is counted against (GitHub reports it in X-RateLimit-Resource)."""
+    if "/search/" in url:
+        return "search"
+    if url.rstrip("/").endswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+class RateLimits:
+    """Last known {resource: (remaining, reset epoch)} from X-RateLimit-* headers, shared by all threads."""
+
+    def __init__(self, low_water: int = 10):
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._state: Dict[str, tuple] = {}
+        self._blocked_until: Dict[str, float] = {}
+
+    def update(self, resource: str, headers) -> None:
+        remaining, reset = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            self._state[resource] = (int(remaining), float(reset))
+
+    def block(self, resource: str, until: float) -> None:
+        with self._lock:
+            self._blocked_until[resource] = max(self._blocked_until.get(resource, 0), until)
+
+    def delay(self, resource: str) -> float:
+        """Seconds to wait before the next call on `resource`.
+
+        Zero while plenty of budget is left; once under `low_water` the
+        remaining calls are spread until the reset; after exhaustion (or a
+        Retry-After) it waits for the reset.
+        """
+        now = time.time()
+        with self._lock:
+            wait = self._blocked_until.get(resource, 0) - now
+            if resource in self._state:
+                remaining, reset = self._state[resource]
+                if reset > now:
+                    if remaining <= 0:
+                        wait = max(wait, reset - now + 1)
+                    elif remaining < self.low_water:
+                        wait = max(wait, (reset - now) / remaining)
+            return max(0.0, wait)
+
+    def consume(self, resource: str, calls: int = 1) -> None:
+        """Count a call that is about to be sent, so concurrent threads see the shrinking budget."""
+        with self._lock:
+            if resource in self._state:
+                remaining, reset = self._state[resource]
+                self._state[resource] = (remaining - calls, reset)
+
+    def refund(self, resource: str) -> None:
+        """Give back a consumed call that GitHub did not charge (a 304 to a conditional request)."""
+        self.consume(resource, -1)
+
+
+class GitHubClient:
+    """Pooled, rate-limit-aware GitHub REST/GraphQL client that is safe to share between threads.
+
+    At most `max_concurrency` requests are in flight. Requests are held back
+    using the X-RateLimit-Remaining/Reset and Retry-After headers; throttled
+    (403/429), 5xx and dropped calls are retried with backoff, so callers only
+    see a response once GitHub has really answered it.
+
+    With a `cache` (http_cache.HttpCache), GETs are revalidated with
+    If-None-Match / If-Modified-Since; a 304 replays the stored body and does
+    not count against the rate limit. `offline=True` serves GETs from the
+    cache only and answers misses with a synthetic 504.
+    """
+
+    def __init__(self, token: Optional[str] = None, base_url: str = API_ROOT, max_concurrency: int = 8,
+                 max_retries: int = 6, backoff: float = 1.0, timeout: float = 30.0,
+                 max_wait: float = 3600.0, session: Optional[requests.Session] = None,
+                 cache: Optional[HttpCache] = None, offline: bool = False):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.cache = cache
+        self.offline = offline
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        if token:
+            self.session.headers["Authorization"] = f"token {token}"
+        self.limits = RateLimits(low_water=max(10, 2 * max_concurrency))
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "GitHubClient":
+        """Token from GITHUB_TOKEN; GITHUB_OFFLINE=1 turns on offline mode."""
+        kwargs.setdefault("offline", os.getenv("GITHUB_OFFLINE", "") not in ("", "0"))
+        return cls(token=os.getenv("GITHUB_TOKEN"), **kwargs)
+
+    def url(self, path_or_url: str) -> str:
+        if path_or_url.startswith(("http://", "https://")):
+            return path_or_url
+        return f"{self.base_url}/{path_or_url.lstrip('/')}"
+
+    def _throttled(self, resp: requests.Response) -> bool:
+        if resp.status_code == 429:
+            return True
+        if resp.status_code != 403:
+            return False
+        return (resp.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in resp.headers
+                or "rate limit" in resp.text.lower())
+
+    def _sleep(self, seconds: float):
+        time.sleep(min(seconds, self.max_wait))
+
+    def request(self, method: str, path_or_url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying throttled, 5xx and dropped calls. 4xx answers are returned as-is."""
+        url = self.url(path_or_url)
+        resource = _resource_of(url)
+        kwargs.setdefault("timeout", self.timeout)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            wait = self.limits.delay(resource)
+            if wait:
+                self._sleep(wait)
+            resp = None
+            with self._slots:
+                self.limits.consume(resource)
+                try:
+                    resp = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    last_error = e
+            if resp is None:
+                # Back off without holding a slot the other workers could use
+                self._sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+                continue
+            if resp.status_code == 304:
+                self.limits.refund(resource)
+            self.limits.update(resource, resp.headers)
+
+            if self._throttled(resp):
+                retry_after = resp.headers.get("Retry-After")
+                reset = resp.headers.get("X-RateLimit-Reset")
+                if retry_after is not None:
+                    until = time.time() + float(retry_after)
+                elif reset is not None and resp.headers.get("X-RateLimit-Remaining") == "0":
+                    until = float(reset) + 1
+                else:  # secondary limit without a hint
+                    until = time.time() + 60 * 2 ** min(attempt, 3)
+                self.limits.block(resource, until)
+                last_error = GitHubError(f"{resp.status_code} rate limited on {url}")
+                continue
+            if resp.status_code in RETRY_STATUSES:
+                last_error = GitHubError(f"{resp.status_code} from {url}")
+                self._sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+                continue
+            return resp
+        raise GitHubError(f"Giving up on {url} after {self.max_retries + 1} attempts: {last_error}")
+
+    def get(self, path_or_url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        if self.cache is None and not self.offline:
+            return self.request("GET", path_or_url, params=params, **kwargs)
+        url = requests.Request("GET", self.url(path_or_url), params=params).prepare().url
+        scope = auth_scope(self.session.headers)
+        entry = self.cache.load(url, scope) if self.cache is not None else None
+        if self.offline:
+            if entry is None:
+                return HttpCache.offline_miss(url)
+            self.cache.count("hits")
+            return HttpCache.replay(entry, "hit")
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            headers.update(HttpCache.validators(entry))
+        resp = self.request("GET", url, headers=headers, **kwargs)
+        if resp.status_code == 304 and entry is not None:
+            self.cache.count("revalidated")
+            return HttpCache.replay(entry, "revalidated")
+        if resp.status_code == 200:
+            self.cache.store(url, scope, resp)
+            self.cache.count("misses")
+        return resp
+
+    def get_json(self, path_or_url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """JSON body of a GET, or None for a 404/410/422 (missing or inaccessible resource)."""
+        resp = self.get(path_or_url, params=params, **kwargs)
+        if resp.status_code in MISSING_STATUSES:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+
+    def graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """`data` of a GraphQL query; errors in the response body raise GitHubError."""
+        if self.offline:
+            raise GitHubError("GraphQL queries are not cached and cannot run offline")
+        resp = self.request("POST", "graphql", json={"query": query, "variables": variables or {}})
+        resp.raise_for_status()
+        body = resp.json()
+        if body.get("errors"):
+            raise GitHubError(f"GraphQL errors: {[e.get('message') for e in body['errors']][:3]}")
+        return body["data"]
+
+    def paginate(self, path_or_url: str, params: Optional[Dict[str, Any]] = None,
+                 missing_ok: bool = False) -> Iterator[Any]:
+        """Items of a REST listing, following `Link: rel="next"` until the last page.
+
+        With `missing_ok`, a 404/410/422 ends the listing quietly (as get_json returns None).
+        """
+        url, page_params = path_or_url, params
+        while url:
+            resp = self.get(url, params=page_params)
+            if missing_ok and resp.status_code in MISSING_STATUSES:
+                return
+            resp.raise_for_status()
+            yield from resp.json()
+            url, page_params = resp.links.get("next", {}).get("url"), None
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], desc: Optional[str] = None) -> List[Any]:
+        """`[fn(item) for item in items]` on `max_concurrency` threads (results in input order)."""
+        items = list(items)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(tqdm(pool.map(fn, items), total=len(items), desc=desc, disable=desc is None))
+
+    def close(self):
+        self.session.close()
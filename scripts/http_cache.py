@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+KEPT_HEADERS = ("ETag", "Last-Modified", "Link", "Content-Type")
+
+
+def auth_scope(session_headers) -> str:
+    """Short fingerprint of the credentials, so responses seen with one token are not served to another."""
+    auth = session_headers.get("Authorization", "")
+    return hashlib.sha256(auth.encode()).hexdigest()[:12] if auth else "anonymous"
+
+
+class HttpCache:
+    """On-disk cache of successful GET responses, keyed by final URL and auth scope.
+
+    Each entry keeps the body plus the validators (ETag / Last-Modified) needed
+    to revalidate it with a conditional request, and the Link header so
+    paginated listings can be replayed offline.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def count(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def _path(self, url: str, scope: str) -> Path:
+        key = hashlib.sha256(f"{scope} {url}".encode()).hexdigest()
+        return self.root / key[:2] / f"{key}.json"
+
+    def load(self, url: str, scope: str) -> Optional[dict]:
+        path = self._path(url, scope)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def store(self, url: str, scope: str, resp: requests.Response):
+        path = self._path(url, scope)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "url": url, "status": resp.status_code, "stored_at": time.time(),
+            "headers": {h: resp.headers[h] for h in KEPT_HEADERS if h in resp.headers},
+            "body": resp.content.decode("utf-8", errors="replace"),
+        }
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        headers = {}
+        if "ETag" in entry["headers"]:
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    @staticmethod
+    def replay(entry: dict, source: str) -> requests.Response:
+        """A Response rebuilt from a cache entry; `X-Cache` says whether it was a hit or a 304 revalidation."""
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp._content = entry["body"].encode("utf-8")
+        resp.headers = CaseInsensitiveDict({**entry["headers"], "X-Cache": source})
+        resp.url = entry["url"]
+        resp.encoding = "utf-8"
+        return resp
+
+    @staticmethod
+    def offline_miss(url: str) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = 504
+        resp.reason = "Not cached (offline)"
+        resp._content = b'{"message": "not in the HTTP cache and running offline"}'
+        resp.headers = CaseInsensitiveDict({"X-Cache": "offline-miss", "Content-Type": "application/json"})
+        resp.url = url
+        return resp
+
+    def summary(self) -> str:
+        return f"HTTP cache: {self.hits} offline hits, {self.revalidated} unchanged (304), {self.misses} downloaded"
@@ -0,0 +1,127 @@
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+
+import org.eclipse.jgit.lib.Repository;
+import org.refactoringminer.api.GitService;
+import org.refactoringminer.api.Refactoring;
+import org.refactoringminer.api.RefactoringHandler;
+import org.refactoringminer.rm1.GitHistoryRefactoringMinerImpl;
+import org.refactoringminer.util.GitServiceImpl;
+
+/**
+ * Long-lived RefactoringMiner worker used by scripts/refminer_service.py.
+ *
+ * Reads one job per line from stdin ("repoPath\tsha") and answers each with one
+ * JSON line on stdout: {"ok":true,"commits":[...]} where each commit has the same
+ * shape as `RefactoringMiner -c ... -json`, or {"ok":false,"error":"..."}.
+ * Anything the library logs is sent to stderr so stdout stays line-delimited.
+ */
+public class RefMinerService {
+
+    private static final Map<String, Repository> REPOS = new HashMap<>();
+
+    public static void main(String[] args) throws Exception {
+        PrintStream out = new PrintStream(System.out, true, "UTF-8");
+        System.setOut(System.err);
+
+        GitService gitService = new GitServiceImpl();
+        GitHistoryRefactoringMinerImpl miner = new GitHistoryRefactoringMinerImpl();
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        out.println("{\"ok\":true,\"ready\":true}");
+        String line;
+        while ((line = in.readLine()) != null) {
+            String[] parts = line.split("\t");
+            if (parts.length != 2) {
+                out.println(error("expected <repoPath>\\t<sha>"));
+                continue;
+            }
+            try {
+                out.println(analyze(gitService, miner, parts[0], parts[1]));
+            } catch (Throwable e) {
+                out.println(error(e.toString()));
+            }
+        }
+        for (Repository repo : REPOS.values()) {
+            repo.close();
+        }
+    }
+
+    private static String analyze(GitService gitService, GitHistoryRefactoringMinerImpl miner,
+                                  String folder, String commitId) throws Exception {
+        Repository repo = REPOS.get(folder);
+        if (repo == null) {
+            repo = gitService.openRepository(new File(folder).getAbsolutePath());
+            REPOS.put(folder, repo);
+        }
+        String cloneURL = repo.getConfig().getString("remote", "origin", "url");
+        List<String> commits = new ArrayList<>();
+        List<Exception> failures = new ArrayList<>();
+
+        miner.detectAtCommit(repo, commitId, new RefactoringHandler() {
+            @Override
+            public void handle(String sha, List<Refactoring> refactorings) {
+                commits.add(commitJSON(cloneURL, sha, refactorings));
+            }
+
+            @Override
+            public void handleException(String sha, Exception e) {
+                failures.add(e);
+            }
+        });
+
+        if (!failures.isEmpty()) {
+            return error(failures.get(0).toString());
+        }
+        return "{\"ok\":true,\"commits\":[" + String.join(",", commits) + "]}";
+    }
+
+    private static String commitJSON(String cloneURL, String sha, List<Refactoring> refactorings) {
+        StringBuilder sb = new StringBuilder();
+        sb.append("{\"repository\":").append(quote(cloneURL));
+        sb.append(",\"sha1\":").append(quote(sha));
+        sb.append(",\"url\":").append(quote(GitHistoryRefactoringMinerImpl.extractCommitURL(cloneURL, sha)));
+        sb.append(",\"refactorings\":[");
+        for (int i = 0; i < refactorings.size(); i++) {
+            if (i > 0) {
+                sb.append(",");
+            }
+            sb.append(refactorings.get(i).toJSON().replace("\r", "").replace("\n", ""));
+        }
+        return sb.append("]}").toString();
+    }
+
+    private static String error(String message) {
+        return "{\"ok\":false,\"error\":" + quote(message) + "}";
+    }
+
+    private static String quote(String s) {
+        if (s == null) {
+            return "null";
+        }
+        StringBuilder sb = new StringBuilder("\"");
+        for (char c : s.toCharArray()) {
+            switch (c) {
+                case '"': sb.append("\\\""); break;
+                case '\\': sb.append("\\\\"); break;
+                case '\n': sb.append("\\n"); break;
+                case '\r': sb.append("\\r"); break;
+                case '\t': sb.append("\\t"); break;
+                default:
+                    if (c < 0x20) {
+                        sb.append(String.format("\\u%04x", (int) c));
+                    } else {
+                        sb.append(c);
+                    }
+            }
+        }
+        return sb.append("\"").toString();
+    }
+}
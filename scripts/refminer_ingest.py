@@ -0,0 +1,185 @@
+import itertools
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+
+BATCH_COMMITS = 1000
+# Every JSON line must fit in one block; RefactoringMiner commit records are far smaller.
+BLOCK_BYTES = 64 << 20
+
+LOCATION_TYPE = pa.struct([
+    ("filePath", pa.string()),
+    ("startLine", pa.int64()),
+    ("endLine", pa.int64()),
+    ("codeElement", pa.string()),
+    ("description", pa.string()),
+])
+# `name` is only parsed because the baseline builder reads it for entities_before/after.
+RAW_LOCATION_TYPE = pa.struct(list(LOCATION_TYPE) + [pa.field("name", pa.string())])
+REFACTORING_TYPE = pa.struct([
+    ("type", pa.string()),
+    ("description", pa.string()),
+    ("leftSideLocations", pa.list_(RAW_LOCATION_TYPE)),
+    ("rightSideLocations", pa.list_(RAW_LOCATION_TYPE)),
+])
+COMMIT_SCHEMA = pa.schema([
+    ("repository", pa.string()),
+    ("sha1", pa.string()),
+    ("url", pa.string()),
+    ("refactorings", pa.list_(REFACTORING_TYPE)),
+])
+
+
+def resolve_rm_output(path: Path) -> Optional[Path]:
+    """Prefer the newline-delimited runner output; fall back to a legacy `{"commits": [...]}` file."""
+    for candidate in (path.with_suffix(".jsonl"), path.with_suffix(".json")):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def iter_commits(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield RefactoringMiner commit records one at a time.
+
+    `.jsonl` files are read line by line; legacy `.json` files still have to be
+    loaded whole.
+    """
+    if path.suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with path.open("r", encoding="utf-8") as f:
+            yield from json.load(f).get("commits", [])
+
+
+def iter_commit_chunks(path: Path, chunk_size: int = BATCH_COMMITS) -> Iterator[List[Dict[str, Any]]]:
+    commits = iter_commits(path)
+    while True:
+        chunk = list(itertools.islice(commits, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_commit_batches(path: Path) -> Iterator[pa.RecordBatch]:
+    """Parse commit records straight into COMMIT_SCHEMA record batches.
+
+    `.jsonl` input goes through Arrow's streaming JSON reader, so no Python
+    objects are created per refactoring or location.
+    """
+    if path.suffix != ".jsonl":
+        for chunk in iter_commit_chunks(path):
+            yield pa.RecordBatch.from_pylist(chunk, schema=COMMIT_SCHEMA)
+        return
+    reader = pj.open_json(
+        path,
+        read_options=pj.ReadOptions(block_size=BLOCK_BYTES),
+        parse_options=pj.ParseOptions(explicit_schema=COMMIT_SCHEMA, unexpected_field_behavior="ignore"),
+    )
+    for batch in reader:
+        yield batch
+
+
+def non_null_lists(arr: pa.Array) -> pa.ListArray:
+    """Same lists with nulls replaced by empty lists."""
+    lengths = pc.fill_null(pc.list_value_length(arr), 0).to_numpy(zero_copy_only=False)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32)
+    return pa.ListArray.from_arrays(pa.array(offsets), pc.list_flatten(arr))
+
+
+def explode_refactorings(batch: pa.RecordBatch) -> pa.Table:
+    """One row per refactoring, with the commit-level fields repeated and `commit_index` into `batch`."""
+    refs = batch.column("refactorings")
+    parents = pc.list_parent_indices(refs)
+    flat = pc.list_flatten(refs)
+    columns = {
+        "commit_index": parents,
+        "repository": pc.take(batch.column("repository"), parents),
+        "sha1": pc.take(batch.column("sha1"), parents),
+        "url": pc.take(batch.column("url"), parents),
+    }
+    for field in REFACTORING_TYPE:
+        columns[field.name] = pc.struct_field(flat, field.name)
+    return pa.table(columns)
+
+
+def project_locations(locs: pa.Array) -> pa.ListArray:
+    """list<RAW_LOCATION_TYPE> -> list<LOCATION_TYPE>, nulls as empty lists."""
+    locs = non_null_lists(locs)
+    values = locs.values
+    fields = [pc.struct_field(values, f.name) for f in LOCATION_TYPE]
+    structs = pa.StructArray.from_arrays(fields, fields=list(LOCATION_TYPE))
+    return pa.ListArray.from_arrays(locs.offsets, structs)
+
+
+def _regroup(parents: pa.Array, values: pa.Array, length: int) -> pa.ListArray:
+    counts = np.bincount(parents.to_numpy(zero_copy_only=False), minlength=length)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+    return pa.ListArray.from_arrays(pa.array(offsets), values)
+
+
+def element_lists(locs: pa.Array, field: str, drop_missing: bool = True) -> pa.ListArray:
+    """Per-row lists of one location field, optionally dropping null/empty values."""
+    locs = non_null_lists(locs)
+    values = pc.struct_field(locs.values, field)
+    if not drop_missing:
+        return pa.ListArray.from_arrays(locs.offsets, values)
+    keep = pc.fill_null(pc.not_equal(values, ""), False)
+    parents = pc.list_parent_indices(locs)
+    return _regroup(parents.filter(keep), values.filter(keep), len(locs))
+
+
+def distinct_sorted_lists(parents: pa.Array, values: pa.Array, length: int,
+                          keep: Optional[Callable[[pa.Array], pa.Array]] = None) -> pa.ListArray:
+    """Sorted distinct non-null `values` for each of `length` parents, as a ListArray."""
+    mask = pc.is_valid(values)
+    if keep is not None:
+        mask = pc.and_(mask, keep(values))
+    pairs = pa.table({"parent": parents, "value": values}).filter(mask)
+    pairs = pairs.group_by(["parent", "value"]).aggregate([])
+    pairs = pairs.sort_by([("parent", "ascending"), ("value", "ascending")])
+    return _regroup(pairs["parent"], pairs["value"].combine_chunks(), length)
+
+
+def map_distinct(arr: pa.Array, fn: Callable[[Optional[str]], Any]) -> pa.Array:
+    """Apply a Python function once per distinct value of a (usually low-cardinality) column."""
+    encoded = pc.dictionary_encode(arr)
+    if isinstance(encoded, pa.ChunkedArray):
+        encoded = encoded.combine_chunks()
+    mapped = pa.array([fn(v) for v in encoded.dictionary.to_pylist()])
+    return pc.take(mapped, encoded.indices)
+
+
+class ParquetBatchWriter:
+    """Append record batches to one Parquet file without holding them in memory."""
+
+    def __init__(self, path: Path, schema: pa.Schema):
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def write(self, batch):
+        if batch.num_rows == 0:
+            return
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        if isinstance(batch, pa.Table):
+            self._writer.write_table(batch)
+        else:
+            self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self, write_empty: bool = False):
+        if self._writer is not None:
+            self._writer.close()
+        elif write_empty:
+            pq.write_table(self.schema.empty_table(), self.path)
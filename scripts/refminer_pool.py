@@ -0,0 +1,184 @@
+import itertools
+import json
+import os
+import subprocess
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from tqdm import tqdm
+
+
+def refminer_classpath(refminer_bin: Path, extra: Iterable[Path] = ()) -> str:
+    entries = [f"{refminer_bin}/bin", f"{refminer_bin}/lib/*", *map(str, extra)]
+    return os.pathsep.join(entries)
+
+
+def refminer_cmd_base(refminer_bin: Path) -> List[str]:
+    """Command prefix for a single-commit RefactoringMiner run (`-c`)."""
+    return [
+        "java", "-cp",
+        refminer_classpath(refminer_bin),
+        "org.refactoringminer.RefactoringMiner",
+        "-c"
+    ]
+
+
+class RefMinerError(Exception):
+    """RefactoringMiner failed on a commit."""
+
+
+class CommitJob(NamedTuple):
+    full_name: str
+    repo_name: str
+    repo_path: Path
+    sha: str
+
+
+class RepoLocks:
+    """Per-repository semaphores so at most `per_repo` jobs read one clone at a time."""
+
+    def __init__(self, per_repo: int = 1):
+        self.per_repo = max(1, per_repo)
+        self._guard = threading.Lock()
+        self._locks: Dict[str, threading.BoundedSemaphore] = {}
+
+    def get(self, repo_name: str) -> threading.BoundedSemaphore:
+        with self._guard:
+            if repo_name not in self._locks:
+                self._locks[repo_name] = threading.BoundedSemaphore(self.per_repo)
+            return self._locks[repo_name]
+
+
+_worker_ids = itertools.count()
+_worker_state = threading.local()
+
+
+def _init_worker():
+    _worker_state.worker_id = next(_worker_ids)
+
+
+def scratch_path(results_dir: Path) -> Path:
+    """Scratch JSON file owned by the calling worker (unique across processes too)."""
+    worker_id = getattr(_worker_state, "worker_id", 0)
+    return results_dir / f"temp_commit_{os.getpid()}_{worker_id}.json"
+
+
+def changed_file_count(repo_path: Path, sha: str) -> int:
+    """Number of files `sha` touches (0 if git cannot tell)."""
+    result = subprocess.run(["git", "-C", str(repo_path), "diff-tree", "--no-commit-id", "-r", "-z", "--name-only", sha],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout.count(b"\0") if result.returncode == 0 else 0
+
+
+def run_refminer(cmd_base: List[str], job: CommitJob, scratch_json: Path,
+                 java_opts: Iterable[str] = (), timeout: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Run RefactoringMiner on one commit and return its `commits` entries."""
+    cmd = cmd_base[:1] + list(java_opts) + cmd_base[1:] + [str(job.repo_path), job.sha, "-json", str(scratch_json)]
+    scratch_json.unlink(missing_ok=True)
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.CalledProcessError as e:
+        raise RefMinerError(f"exit code {e.returncode}", e.stderr.decode(errors="ignore")[-2000:]) from e
+    except subprocess.TimeoutExpired as e:
+        raise RefMinerError(f"timed out after {timeout}s") from e
+
+    commits = []
+    if scratch_json.exists():
+        with open(scratch_json, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        commits = data.get("commits", [])
+        scratch_json.unlink()
+    return commits
+
+
+class ProcessBackend:
+    """One `java ... RefactoringMiner -c` process per commit (the original mode).
+
+    With a `scheduler` (analysis_scripts.jvm_scheduler.JvmScheduler), each JVM
+    gets a heap and timeout sized from the commit's changed-file count and only
+    starts once it fits in the memory budget.
+    """
+
+    def __init__(self, cmd_base: List[str], results_dir: Path, scheduler=None):
+        self.cmd_base = cmd_base
+        self.results_dir = results_dir
+        self.scheduler = scheduler
+
+    def analyze(self, job: CommitJob) -> List[Dict[str, Any]]:
+        if self.scheduler is None:
+            return run_refminer(self.cmd_base, job, scratch_path(self.results_dir))
+        with self.scheduler.slot("refminer", changed_file_count(job.repo_path, job.sha)) as slot:
+            try:
+                return run_refminer(self.cmd_base, job, scratch_path(self.results_dir),
+                                    java_opts=slot.java_opts, timeout=slot.timeout)
+            except RefMinerError as e:
+                slot.failed(stderr=e.args[-1] if len(e.args) > 1 else "", timed_out="timed out" in e.args[0])
+                raise
+
+    def close(self):
+        pass
+
+
+def interleave_by_repo(jobs: List[CommitJob]) -> List[int]:
+    """Job indices ordered round-robin across repos, so workers rarely wait on the same repo lock."""
+    queues = defaultdict(deque)
+    for i, job in enumerate(jobs):
+        queues[job.repo_name].append(i)
+    order = []
+    while queues:
+        for repo_name in list(queues):
+            order.append(queues[repo_name].popleft())
+            if not queues[repo_name]:
+                del queues[repo_name]
+    return order
+
+
+def mine_commits(jobs: List[CommitJob], backend_factory: Callable[[], Any],
+                 workers: int = 1, per_repo: int = 1,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """Analyze `jobs` on a thread pool; results come back in the same order as `jobs`.
+
+    `backend_factory` is called once per worker thread and must return an object
+    with `analyze(job)` and `close()` (see ProcessBackend / refminer_service.ServiceBackend).
+    Each result is a dict with `job`, `ok` and `commits` (the RefactoringMiner
+    entries for that commit, empty on failure). `on_result` is called from the
+    calling thread as each job finishes, e.g. to checkpoint it.
+    """
+    locks = RepoLocks(per_repo)
+    backends = []
+    backends_guard = threading.Lock()
+
+    def worker_backend():
+        if not hasattr(_worker_state, "backend"):
+            _worker_state.backend = backend_factory()
+            with backends_guard:
+                backends.append(_worker_state.backend)
+        return _worker_state.backend
+
+    def analyze(job: CommitJob) -> Dict[str, Any]:
+        backend = worker_backend()
+        with locks.get(job.repo_name):
+            try:
+                return {"job": job, "ok": True, "commits": backend.analyze(job)}
+            except RefMinerError:
+                return {"job": job, "ok": False, "commits": []}
+
+    results: List[Any] = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, workers), initializer=_init_worker) as pool:
+        futures = {pool.submit(analyze, jobs[i]): i for i in interleave_by_repo(jobs)}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Analyzing commits"):
+            res = fut.result()
+            results[futures[fut]] = res
+            if on_result is not None:
+                on_result(res)
+            job = res["job"]
+            if res["ok"]:
+                print(f"Analyzed {job.repo_name} ({job.sha[:8]})")
+            else:
+                print(f"Failed for {job.repo_name} ({job.sha[:8]})")
+    for backend in backends:
+        backend.close()
+    return results
@@ -0,0 +1,198 @@
+import json
+import subprocess
+import threading
+from pathlib import Path
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from analysis_scripts.jvm_scheduler import JobEstimate, JvmScheduler, JvmSlot
+from refminer_pool import CommitJob, ProcessBackend, RefMinerError, changed_file_count, refminer_classpath
+
+SERVICE_SRC = Path(__file__).resolve().parent / "java" / "RefMinerService.java"
+SERVICE_CLASS = "RefMinerService"
+
+_build_lock = threading.Lock()
+
+
+class RefMinerServiceError(RefMinerError):
+    """The service could not analyze a commit (or is not running)."""
+
+
+class RefMinerServiceTimeout(RefMinerServiceError):
+    """A commit took longer than its timeout; the service JVM was killed."""
+
+
+def build_service(refminer_bin: Path, build_dir: Path) -> Path:
+    """Compile RefMinerService.java against the RefactoringMiner jars if it is missing or stale."""
+    class_file = build_dir / f"{SERVICE_CLASS}.class"
+    with _build_lock:
+        if class_file.exists() and class_file.stat().st_mtime >= SERVICE_SRC.stat().st_mtime:
+            return build_dir
+        build_dir.mkdir(parents=True, exist_ok=True)
+        cmd = ["javac", "-cp", refminer_classpath(refminer_bin), "-d", str(build_dir), str(SERVICE_SRC)]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RefMinerServiceError(f"javac failed: {result.stderr.decode(errors='ignore')[:300]}")
+    return build_dir
+
+
+class RefMinerService:
+    """Client for one long-lived RefactoringMiner JVM speaking the line protocol in RefMinerService.java."""
+
+    def __init__(self, refminer_bin: Path, build_dir: Optional[Path] = None, java_opts: Optional[List[str]] = None):
+        self.refminer_bin = refminer_bin
+        self.build_dir = build_dir or refminer_bin.parent / "refminer-service"
+        self.java_opts = java_opts or []
+        self.proc: Optional[subprocess.Popen] = None
+
+    def start(self):
+        build_service(self.refminer_bin, self.build_dir)
+        classpath = refminer_classpath(self.refminer_bin, extra=[self.build_dir])
+        self.proc = subprocess.Popen(
+            ["java", *self.java_opts, "-cp", classpath, SERVICE_CLASS],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1,
+        )
+        hello = self._read()
+        if not hello.get("ready"):
+            self.close()
+            raise RefMinerServiceError(f"service did not start: {hello}")
+        return self
+
+    def _read(self) -> Dict[str, Any]:
+        line = self.proc.stdout.readline()
+        if not line.endswith("\n"):  # EOF, possibly mid-reply
+            self.close()
+            raise RefMinerServiceError("service exited")
+        return json.loads(line)
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def analyze(self, repo_path: Path, sha: str, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return the RefactoringMiner `commits` entries for one commit.
+
+        If no reply arrives within `timeout` seconds the JVM is killed (it cannot
+        abandon a running analysis) and RefMinerServiceTimeout is raised.
+        """
+        if not self.alive():
+            raise RefMinerServiceError("service is not running")
+        try:
+            self.proc.stdin.write(f"{Path(repo_path).resolve()}\t{sha}\n")
+            self.proc.stdin.flush()
+        except OSError as e:
+            self.close()
+            raise RefMinerServiceError(f"service pipe closed: {e}")
+        proc, expired = self.proc, threading.Event()
+
+        def kill():
+            expired.set()
+            proc.kill()
+
+        watchdog = threading.Timer(timeout, kill) if timeout else None
+        if watchdog is not None:
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            reply = self._read()
+        except RefMinerServiceError:
+            if expired.is_set():
+                raise RefMinerServiceTimeout(f"timed out after {timeout}s")
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+        if not reply.get("ok"):
+            raise RefMinerServiceError(reply.get("error", "unknown error"))
+        return reply.get("commits", [])
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+        self.proc = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ServiceBackend:
+    """Pool backend that sends jobs to a per-worker RefMinerService JVM.
+
+    Falls back to one process per commit if the service cannot be built or
+    started. If the JVM dies mid-job, that commit goes to the fallback (it may
+    be what killed the JVM) and the service is restarted for the next one.
+
+    With a `scheduler`, the running JVM holds `heap_mb` of the memory budget
+    and every commit gets the scheduler's timeout; a commit that exceeds it
+    fails and the JVM is restarted.
+    """
+
+    def __init__(self, refminer_bin: Path, fallback: ProcessBackend, heap_mb: int = 4096,
+                 scheduler: Optional[JvmScheduler] = None):
+        self.fallback = fallback
+        self.heap_mb = heap_mb
+        self.scheduler = scheduler
+        self.held_mb = 0
+        self.service: Optional[RefMinerService] = RefMinerService(refminer_bin, java_opts=[f"-Xmx{heap_mb}m"])
+        try:
+            self._start()
+        except (RefMinerServiceError, OSError) as e:
+            print(f"RefactoringMiner service unavailable ({e}); using one process per commit.")
+            self.service = None
+
+    def _start(self):
+        if self.scheduler is not None:
+            self.held_mb = self.scheduler.hold(self.heap_mb)
+        try:
+            self.service.start()
+        except BaseException:
+            self._stop()
+            raise
+
+    def _stop(self):
+        self.service.close()
+        if self.held_mb:
+            self.scheduler.release(self.held_mb)
+            self.held_mb = 0
+
+    def _track(self, job: CommitJob):
+        if self.scheduler is None:
+            return nullcontext(JvmSlot(JobEstimate(self.heap_mb, None)))
+        return self.scheduler.track("refminer", changed_file_count(job.repo_path, job.sha), heap_mb=self.heap_mb)
+
+    def analyze(self, job: CommitJob) -> List[Dict[str, Any]]:
+        if self.service is not None and not self.service.alive():
+            try:
+                self._start()
+            except (RefMinerServiceError, OSError):
+                self.service = None
+        if self.service is None:
+            return self.fallback.analyze(job)
+        try:
+            with self._track(job) as slot:
+                try:
+                    return self.service.analyze(job.repo_path, job.sha, timeout=slot.timeout)
+                except RefMinerServiceError as e:
+                    slot.failed(stderr=str(e), timed_out=isinstance(e, RefMinerServiceTimeout))
+                    raise
+        except RefMinerServiceTimeout:
+            self._stop()  # restarted on the next job
+            raise
+        except RefMinerServiceError:
+            if self.service.alive():
+                raise
+        # Never resend the commit the JVM died on; the service restarts on the next job.
+        self._stop()
+        return self.fallback.analyze(job)
+
+    def close(self):
+        if self.service is not None:
+            self._stop()
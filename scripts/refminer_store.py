@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Key = Tuple[str, str]
+
+
+class ResultStore:
+    """Append-only per-commit RefactoringMiner result store.
+
+    `records.z` holds one zlib-compressed JSON list of commit entries per
+    (full_name, sha) key, appended back to back; `index.jsonl` maps each key to
+    its offset/length. An index line is only written after its record is
+    flushed, so a run killed mid-write loses at most the commit in flight.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.data_path = root / "records.z"
+        self.index_path = root / "index.jsonl"
+        self._lock = threading.Lock()
+        self.index: Dict[Key, Tuple[int, int]] = {}
+        self._load_index()
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return
+        data_size = self.data_path.stat().st_size if self.data_path.exists() else 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                if entry["offset"] + entry["length"] > data_size:
+                    continue
+                self.index[(entry["full_name"], entry["sha"])] = (entry["offset"], entry["length"])
+        with open(self.index_path, "rb+") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def done_keys(self) -> set:
+        return set(self.index)
+
+    def put(self, full_name: str, sha: str, commits: List[Dict[str, Any]]):
+        blob = zlib.compress(json.dumps(commits, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            with open(self.data_path, "ab") as data:
+                offset = data.tell()
+                data.write(blob)
+                data.flush()
+                os.fsync(data.fileno())
+            entry = {"full_name": full_name, "sha": sha, "offset": offset, "length": len(blob)}
+            with open(self.index_path, "a", encoding="utf-8") as index:
+                index.write(json.dumps(entry) + "\n")
+            self.index[(full_name, sha)] = (offset, len(blob))
+
+    def get(self, full_name: str, sha: str) -> Optional[List[Dict[str, Any]]]:
+        loc = self.index.get((full_name, sha))
+        if loc is None:
+            return None
+        with open(self.data_path, "rb") as data:
+            return self._read(data, *loc)
+
+    @staticmethod
+    def _read(data, offset: int, length: int) -> List[Dict[str, Any]]:
+        data.seek(offset)
+        return json.loads(zlib.decompress(data.read(length)))
+
+    def iter_commits(self, keys: Optional[List[Key]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield stored commit entries for `keys` (default: every key, in insertion order)."""
+        keys = list(self.index) if keys is None else [k for k in keys if k in self.index]
+        if not keys:
+            return
+        with open(self.data_path, "rb") as data:
+            for key in keys:
+                yield from self._read(data, *self.index[key])
@@ -0,0 +1,189 @@
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from tqdm import tqdm
+
+
+class CloneJob(NamedTuple):
+    url: str
+    dest: Path
+    upstream_url: Optional[str] = None  # network the repo belongs to; None clones standalone
+
+
+def store_name(url: str) -> str:
+    """`owner__repo.git` for an https://, git@ or file:// repository URL."""
+    parts = url.rstrip("/").replace(":", "/").split("/")
+    owner, repo = parts[-2], parts[-1]
+    if repo.endswith(".git"):
+        repo = repo[:-4]
+    return f"{owner}__{repo}.git"
+
+
+def _git(*args, cwd: Optional[Path] = None) -> subprocess.CompletedProcess:
+    cmd = ["git", *(["-C", str(cwd)] if cwd else []), *args]
+    return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+class ObjectStores:
+    """One bare object store per upstream network, shared by all clones of that network via alternates.
+
+    The upstream's branches are fetched into `refs/upstream/*` of the store, so
+    they stay reachable and are never pruned; clones made with
+    `--reference` only download the objects the store lacks. The stores must
+    not be deleted or gc'd while repositories that borrow from them exist.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._guard = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._ready: Dict[str, Optional[Path]] = {}
+
+    def _lock(self, name: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def ensure(self, upstream_url: str) -> Optional[Path]:
+        """Create or refresh the store of `upstream_url` (once per run); None if it cannot be fetched."""
+        name = store_name(upstream_url)
+        with self._lock(name):
+            if name in self._ready:
+                return self._ready[name]
+            store = self.root / name
+            if not (store / "objects").exists():
+                result = _git("init", "--quiet", "--bare", str(store))
+                if result.returncode != 0:
+                    self._ready[name] = None
+                    return None
+            result = _git("fetch", "--quiet", "--no-tags", upstream_url,
+                          "+refs/heads/*:refs/upstream/heads/*", cwd=store)
+            if result.returncode != 0:
+                print(f"⚠️ Could not fetch upstream {upstream_url} into {name}: "
+                      f"{result.stderr.decode(errors='ignore').strip()[:200]}")
+                # A store filled by an earlier run is still worth borrowing from.
+                refs = _git("for-each-ref", "--count=1", "refs/upstream/", cwd=store).stdout
+                self._ready[name] = store if refs.strip() else None
+            else:
+                self._ready[name] = store
+            return self._ready[name]
+
+
+def clone_repo(job: CloneJob, stores: Optional[ObjectStores] = None, extra_args: Iterable[str] = ()) -> str:
+    """Clone `job.url` into `job.dest`, borrowing objects from its network store if there is one.
+
+    Clones go to `<dest>.partial` first and are renamed when complete, so an
+    interrupted run never leaves a half-cloned repo that looks finished.
+    Returns "skipped", "cloned" or "failed".
+    """
+    if job.dest.exists():
+        return "skipped"
+    reference = stores.ensure(job.upstream_url) if stores is not None and job.upstream_url else None
+    tmp = job.dest.with_name(job.dest.name + ".partial")
+    shutil.rmtree(tmp, ignore_errors=True)
+    args = ["clone", "--quiet", *extra_args]
+    if reference is not None:
+        args += ["--reference-if-able", str(reference)]
+    result = _git(*args, job.url, str(tmp))
+    if result.returncode != 0:
+        shutil.rmtree(tmp, ignore_errors=True)
+        print(f"❌ Failed to clone {job.url}: {result.stderr.decode(errors='ignore').strip()[:200]}")
+        return "failed"
+    tmp.rename(job.dest)
+    return "cloned"
+
+
+def clone_all(jobs: List[CloneJob], stores: Optional[ObjectStores] = None, workers: int = 4,
+              extra_args: Iterable[str] = ()) -> Dict[str, List[CloneJob]]:
+    """Clone `jobs` on a bounded thread pool; returns the jobs grouped by outcome."""
+    extra_args = list(extra_args)
+    outcome: Dict[str, List[CloneJob]] = {"cloned": [], "skipped": [], "failed": []}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(clone_repo, job, stores, extra_args): job for job in jobs}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Cloning repos"):
+            outcome[fut.result()].append(futures[fut])
+    return outcome
+
+
+def missing_objects(repo: Path, specs: Iterable[str]) -> List[str]:
+    """The object specs (e.g. `sha`, `sha^1`) that do not resolve in `repo` without fetching."""
+    specs = list(specs)
+    if not specs:
+        return []
+    result = subprocess.run(["git", "-C", str(repo), "cat-file", "--batch-check"],
+                            input="".join(f"{s}\n" for s in specs).encode(),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            env={**os.environ, "GIT_NO_LAZY_FETCH": "1"})  # honoured by git >= 2.45
+    lines = result.stdout.decode(errors="ignore").splitlines()
+    if result.returncode != 0 or len(lines) != len(specs):
+        return specs
+    return [s for s, line in zip(specs, lines) if line.endswith(" missing")]
+
+
+def init_partial_repo(dest: Path, url: str, blobless: bool = True) -> bool:
+    """Empty repo with `origin` set up as a (blobless) promisor remote, ready for fetch-by-SHA."""
+    if _git("init", "--quiet", str(dest)).returncode != 0:
+        return False
+    _git("remote", "add", "origin", url, cwd=dest)
+    if blobless:
+        _git("config", "remote.origin.promisor", "true", cwd=dest)
+        _git("config", "remote.origin.partialclonefilter", "blob:none", cwd=dest)
+    return True
+
+
+MINED_REFS = "refs/mined/"  # one ref per fetched commit, so gc never prunes it
+
+
+def fetch_commits(repo: Path, shas: List[str], depth: int = 2, blobless: bool = True) -> List[str]:
+    """Fetch exactly `shas` from origin into `refs/mined/<sha>`; returns SHAs still missing.
+
+    `depth` only applies to repos that have no refs besides refs/mined (made by
+    init_partial_repo) or are already shallow, and `blobless` only to promisor
+    repos, so fetching into a full clone keeps it complete.
+    """
+    args = ["fetch", "--quiet", "--no-tags", "--no-write-fetch-head"]
+    shallow = _git("rev-parse", "--is-shallow-repository", cwd=repo).stdout.strip() == b"true"
+    refs = _git("for-each-ref", "--format=%(refname)", cwd=repo).stdout.decode(errors="ignore").split()
+    if shallow or all(ref.startswith(MINED_REFS) for ref in refs):
+        args.append(f"--depth={depth}")
+    promisor = _git("config", "--bool", "--get", "remote.origin.promisor", cwd=repo).stdout.strip() == b"true"
+    if blobless and promisor:
+        args.append("--filter=blob:none")
+    result = _git(*args, "origin", *(f"{sha}:{MINED_REFS}{sha}" for sha in shas), cwd=repo)
+    if result.returncode != 0 and len(shas) > 1:
+        # One unreachable SHA fails the whole request; retry the rest one by one.
+        for sha in missing_objects(repo, shas):
+            _git(*args, "origin", f"{sha}:{MINED_REFS}{sha}", cwd=repo)
+    elif result.returncode != 0:
+        print(f"⚠️ Fetch failed in {repo.name}: {result.stderr.decode(errors='ignore').strip()[:200]}")
+    return missing_objects(repo, shas)
+
+
+def prefetch_blobs(repo: Path, shas: List[str], suffix: str = ".java") -> int:
+    """Download, in one request, the before/after blobs of the `suffix` files each SHA changes.
+
+    The analysis stages (and RefactoringMiner's JGit, which cannot fetch lazily)
+    need these blobs locally; everything else in a blobless repo stays remote.
+    """
+    oids = set()
+    for sha in shas:
+        out = _git("diff-tree", "--no-commit-id", "-r", "-z", sha, cwd=repo).stdout.decode(errors="surrogateescape")
+        fields = out.split("\0")
+        for meta, path in zip(fields[0::2], fields[1::2]):
+            parts = meta.lstrip(":").split()
+            if len(parts) >= 5 and path.endswith(suffix):
+                oids.update(o for o in parts[2:4] if set(o) != {"0"})
+    missing = missing_objects(repo, sorted(oids))
+    if missing:
+        # Same invocation git uses for its own lazy fetches, but batched.
+        subprocess.run(["git", "-C", str(repo), "-c", "fetch.negotiationAlgorithm=noop", "fetch", "origin",
+                        "--quiet", "--no-tags", "--no-write-fetch-head", "--recurse-submodules=no",
+                        "--filter=blob:none", "--stdin"],
+                       input="".join(f"{o}\n" for o in missing).encode(),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return len(missing)
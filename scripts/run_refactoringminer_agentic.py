@@ -1,8 +1,12 @@
-import subprocess
+import argparse
 import json
 import pandas as pd
 from pathlib import Path
-from tqdm import tqdm
+
+from analysis_scripts.jvm_scheduler import JvmScheduler, default_budget_mb
+from refminer_pool import CommitJob, ProcessBackend, mine_commits, refminer_cmd_base
+from refminer_service import ServiceBackend
+from refminer_store import ResultStore
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_PATH = PROJECT_ROOT / "data" / "agentic_pr_commits.parquet"
@@ -11,14 +15,35 @@ REPOS_DIR = PROJECT_ROOT / "repos_forks"
 RESULTS_DIR = PROJECT_ROOT / "data" / "refminer_results"
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
-FINAL_OUTPUT = RESULTS_DIR / "refminer_all.json"
+STORE_DIR = RESULTS_DIR / "store"
+JVM_HISTORY = PROJECT_ROOT / "outputs" / "logs" / "jvm_history.jsonl"
+FINAL_OUTPUT = RESULTS_DIR / "refminer_all.jsonl"
+
+REFMINER_CMD_BASE = refminer_cmd_base(REFMINER_BIN)
+
+parser = argparse.ArgumentParser(description="Run RefactoringMiner over agentic PR commits.")
+parser.add_argument("--workers", type=int, default=1, help="Number of concurrent RefactoringMiner jobs.")
+parser.add_argument("--per-repo", type=int, default=1, help="Max concurrent jobs on the same repository clone.")
+parser.add_argument("--backend", choices=["service", "process"], default="service",
+                    help="'service' keeps one RefactoringMiner JVM per worker; 'process' starts one JVM per commit.")
+parser.add_argument("--mem-budget-gb", type=float, default=default_budget_mb() / 1024,
+                    help="Total memory the concurrent RefactoringMiner JVMs may use (default: 75%% of RAM).")
+parser.add_argument("--service-heap-mb", type=int, default=4096, help="Heap of each long-lived service JVM.")
+args = parser.parse_args()
+
+scheduler = JvmScheduler(int(args.mem_budget_gb * 1024), JVM_HISTORY)
+if args.backend == "service" and args.workers > scheduler.max_concurrent(args.service_heap_mb):
+    args.workers = scheduler.max_concurrent(args.service_heap_mb)
+    print(f"Only {args.workers} service JVMs of {args.service_heap_mb} MB fit in the memory budget; "
+          f"using {args.workers} workers.")
+
+
+def make_backend():
+    fallback = ProcessBackend(REFMINER_CMD_BASE, RESULTS_DIR, scheduler)
+    if args.backend == "process":
+        return fallback
+    return ServiceBackend(REFMINER_BIN, fallback, heap_mb=args.service_heap_mb, scheduler=scheduler)
 
-REFMINER_CMD_BASE = [
-    "java", "-cp",
-    f"{REFMINER_BIN}/bin;{REFMINER_BIN}/lib/*",
-    "org.refactoringminer.RefactoringMiner",
-    "-c"
-]
 
 print(f"Loading commits from {DATA_PATH}")
 df = pd.read_parquet(DATA_PATH)
@@ -26,45 +51,48 @@ num_prs = df["pr_id"].nunique()
 num_repos = df["full_name"].nunique()
 print(f"Loaded {len(df)} commits from {num_prs} PRs across {num_repos} repos.")
 
-#Counters
-successful_commits = 0
-failed_commits = []
-successful_repos = set()
-all_results = []
+store = ResultStore(STORE_DIR)
+keys = list(dict.fromkeys(zip(df["full_name"], df["sha"])))
 
-for _, row in tqdm(df.iterrows(), total=len(df), desc="Analyzing commits"):
-    repo_name = row["full_name"].split("/")[-1]
+jobs = []
+for full_name, sha in keys:
+    if (full_name, sha) in store:
+        continue
+    repo_name = full_name.split("/")[-1]
     repo_path = REPOS_DIR / repo_name
-    sha = row["sha"]
 
     if not repo_path.exists():
         print(f"Missing repo: {repo_name}, skipping {sha[:8]}")
         continue
+    jobs.append(CommitJob(full_name, repo_name, repo_path, sha))
 
-    temp_json = RESULTS_DIR / "temp_commit.json"
-    cmd = REFMINER_CMD_BASE + [str(repo_path), sha, "-json", str(temp_json)]
+print(f"{len(store)} commits already in {STORE_DIR}, {len(jobs)} left to analyze.")
 
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-        if temp_json.exists():
-            with open(temp_json, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            all_results.extend(data.get("commits", []))
-            temp_json.unlink()
+def checkpoint(res):
+    if res["ok"]:
+        store.put(res["job"].full_name, res["job"].sha, res["commits"])
 
-        successful_commits += 1
-        successful_repos.add(repo_name)
-        print(f"Analyzed {repo_name} ({sha[:8]})")
 
-    except subprocess.CalledProcessError:
-        failed_commits.append((repo_name, sha))
-        print(f"Failed for {repo_name} ({sha[:8]})")
-        continue
+results = mine_commits(jobs, make_backend, workers=args.workers, per_repo=args.per_repo, on_result=checkpoint)
+
+#Counters
+successful_commits = 0
+failed_commits = []
+successful_repos = set()
+
+for res in results:
+    job = res["job"]
+    if res["ok"]:
+        successful_commits += 1
+        successful_repos.add(job.repo_name)
+    else:
+        failed_commits.append((job.repo_name, job.sha))
 
-print("\nWriting combined JSON output...")
+print("\nWriting combined JSON Lines output...")
 with open(FINAL_OUTPUT, "w", encoding="utf-8") as f:
-    json.dump({"commits": all_results}, f, indent=2)
+    for commit in store.iter_commits(keys):
+        f.write(json.dumps(commit, separators=(",", ":")) + "\n")
 
 print("\nSUMMARY")
 print(f"Total successful commits: {successful_commits}")